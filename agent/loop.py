@@ -1,17 +1,27 @@
 import json
 import os
-import re
 import time
 import uuid
-from typing import Dict, Tuple, Any, List
+from typing import Dict, Tuple, Any, List, Optional
 
 from tools.builtin import BaseTool, get_builtin_tools
 from agent.logger import JSONLLogger
+from agent.needle import extract_needles, scan_needle
+from memory.doc_buffer import DocSpan, chunk_spans, open_document
+from memory.doc_index import DocIndex, index_path
+from memory.facts import extract_facts
 from memory.memory import MemoryManager
+from memory.note_log import TextNoteStore
+from memory.sqlite_notes import SQLiteNoteStore
 from memory.summary import summarize_text
+from memory.hashed_store import HashedVectorStore
+from memory.sparse_store import SparseVectorStore
 from memory.vector_store import VectorStore
 from agent.context import ContextManager
 
+# words per doc_chunk note in retrieval mode
+CHUNK_WORDS = 300
+
 
 class ReActAgent:
     def __init__(
@@ -22,6 +32,11 @@ class ReActAgent:
         max_steps: int = 8,
         context_window_words: int = 1200,
         memory_mode: str = "none",  # none | summary | retrieval | both
+        vector_store: Optional[VectorStore] = None,
+        snapshot_path: Optional[str] = None,
+        retrieval_top_k: int = 3,
+        needle_scan: str = "read",  # read | stream
+        doc_index: Optional[DocIndex] = None,
     ):
         self.tools = tools
         self.logger = logger
@@ -30,6 +45,19 @@ class ReActAgent:
         self.context_window_words = context_window_words
         self.memory_mode = memory_mode
         self.ctx_mgr = ContextManager(max_words=context_window_words)
+        self.vector_store = vector_store
+        self.snapshot_path = snapshot_path
+        self.retrieval_top_k = retrieval_top_k
+        self.needle_scan = needle_scan
+        self.doc_index = doc_index
+
+    def close(self) -> None:
+        """Persist the vector store snapshot, if one was configured, flush and close the note store, and close the tools."""
+        if self.vector_store is not None and self.snapshot_path:
+            self.vector_store.save(self.snapshot_path)
+        self.memory.close()
+        for tool in self.tools.values():
+            tool.close()
 
     def run_task(self, task: Dict[str, Any], run_id: str) -> Tuple[str, Dict[str, Any]]:
         task_id = task.get("id") or str(uuid.uuid4())
@@ -48,18 +76,35 @@ class ReActAgent:
         thought = "Need to scan the document and extract the hidden value for the given key."
         self.logger.log_step(run_id, task_id, step, thought, action="observe", tool=None, tool_input=None, observation=None)
 
-        # Step 1: read file
+        # Step 1: read file, or stream it until the needle shows up
         step += 1
-        raw_doc = self.tools["read_file"].run(path=doc_path).output
-        observation = raw_doc
-        if self.context_window_words:
-            words = raw_doc.split()
-            observation = " ".join(words[: self.context_window_words])
+        scanned = None
+        if self.needle_scan == "stream":
+            # same window as a full read, but memory is bounded by the block size
+            scan = scan_needle(doc_path, key, max_words=self.context_window_words or None)
+            scanned = scan.value
+            observation = scan.head
+            search_text = ""
+            # summaries still cover the whole document; retrieval chunks it from its own buffer
+            raw_doc = self.tools["read_file"].run(path=doc_path).output if self.memory_mode in {"summary", "both"} else ""
+        elif self.context_window_words and self.memory_mode not in {"summary", "both"}:
+            # nothing needs the whole document: read just the words in the window
+            raw_doc = ""
+            window = self.tools["read_file"].run(path=doc_path, end=self.context_window_words, unit="words").output
+            observation = " ".join(window.split())
+            search_text = observation
+        else:
+            raw_doc = self.tools["read_file"].run(path=doc_path).output
+            observation = raw_doc
+            if self.context_window_words:
+                words = raw_doc.split()
+                observation = " ".join(words[: self.context_window_words])
+            search_text = observation
         self.logger.log_step(
             run_id,
             task_id,
             step,
-            thought="Read document",
+            thought="Stream document for needle" if self.needle_scan == "stream" else "Read document",
             action="tool",
             tool="read_file",
             tool_input={"path": doc_path},
@@ -69,23 +114,26 @@ class ReActAgent:
 
         # Step 2: search for key
         step += 1
-        search_text = observation
         if self.memory_mode in {"summary", "both"}:
             summary = summarize_text(raw_doc, max_words=120, prefer_keyword="NEEDLE")
             self.tools["append_note"].run(note=f"doc_summary: {summary}", session="needle")
             search_text = summary
+        doc_id = None
         if self.memory_mode in {"retrieval", "both"}:
-            # chunk document and index
-            chunk_words = raw_doc.split()
-            chunk_size = 300
-            for i in range(0, len(chunk_words), chunk_size):
-                chunk = " ".join(chunk_words[i : i + chunk_size])
-                self.tools["append_note"].run(note=f"doc_chunk: {chunk}", session="needle")
-            retrieved = self.tools["search_memory"].run(query=key, session="needle", top_k=3).output
+            doc_id = self._index_document(doc_path, session="needle")
+
+        # exact-key fast path: facts were indexed, per document, as its chunks went in
+        fact = None
+        if doc_id is not None:
+            fact = self.tools["search_memory"].lookup(key, session="needle", doc=doc_id)
+        if fact is None and self.memory_mode in {"retrieval", "both"}:
+            retrieved = self.tools["search_memory"].run(query=key, session="needle", top_k=self.retrieval_top_k).output
             search_text = retrieved or search_text
 
-        value = self._extract_needle(search_text, key)
-        if value is None:
+        value = fact.value if fact is not None else self._extract_needle(search_text, key)
+        if value is None and self.needle_scan == "stream":
+            value = scanned
+        elif value is None:
             # maybe file large; re-read full content via data if truncated
             full_content = observation
             value = self._extract_needle(full_content, key)
@@ -98,18 +146,39 @@ class ReActAgent:
         self.logger.log_step(run_id, task_id, step, thought="Return answer", action="final", tool=None, tool_input=None, observation=answer, decision=answer)
         return answer, {"steps": step}
 
+    def _index_document(self, doc_path: str, session: str) -> str:
+        """Chunk a document into notes, or re-attach the chunks a previous task already stored.
+
+        Chunks go to the vector store as spans into the document's shared
+        buffer, so the store holds no copy of their text. Returns the
+        document's id, under which its facts are indexed.
+        """
+        doc = open_document(doc_path)
+        if self.doc_index is not None and self.vector_store is not None:
+            entry = self.doc_index.lookup(doc_path, doc.doc_id, session, CHUNK_WORDS)
+            # ids are only trusted while the store still holds those exact chunks;
+            # ids of another backend's shape count as a miss
+            if entry is not None and len(entry["vids"]) == len(entry["spans"]) and all(
+                isinstance(vid, str) and self.vector_store.get_text(vid) == doc.chunk(start, end)
+                for vid, (start, end) in zip(entry["vids"], entry["spans"])
+            ):
+                # the fact log may have been cleared since the document was indexed
+                self.tools["append_note"].facts.add(DocIndex.facts(entry), session=session, doc=doc.doc_id)
+                return doc.doc_id
+        spans = chunk_spans(doc.text(), CHUNK_WORDS)
+        chunks = [DocSpan(doc.doc_id, start, end) for start, end in spans]
+        vids = self.tools["append_note"].append_notes(notes=chunks, session=session).data
+        if self.doc_index is not None and vids:
+            facts = [pair for start, end in spans for pair in extract_facts(doc.chunk(start, end))]
+            self.doc_index.record(doc_path, doc.doc_id, session, CHUNK_WORDS, spans, vids, facts)
+        return doc.doc_id
+
     def _extract_needle(self, text: str, key: str) -> str | None:
-        if not text:
-            return None
-        pattern = re.compile(rf"NEEDLE\s*:\s*{re.escape(key)}\s*->\s*([^\s]+)")
-        m = pattern.search(text)
-        if m:
-            return m.group(1).strip().strip(".,;:!?")
-        pattern2 = re.compile(rf"{re.escape(key)}\s*:\s*(\S+)")
-        m2 = pattern2.search(text)
-        if m2:
-            return m2.group(1).strip().strip(".,;:!?")
-        return None
+        return extract_needles(text, [key])[key]
+
+    def extract_needles(self, text: str, keys: List[str]) -> Dict[str, str | None]:
+        """Needle values for many keys over the same text in a single scan."""
+        return extract_needles(text, keys)
 
     # Long-horizon instruction following
     def _run_long_horizon(self, task: Dict[str, Any], run_id: str, task_id: str) -> Tuple[str, Dict[str, Any]]:
@@ -174,11 +243,59 @@ class ReActAgent:
 
 # Convenience factory
 
-def build_agent(log_path: str, use_memory: bool = False) -> ReActAgent:
+VECTOR_BACKENDS = {"bow": VectorStore, "sparse": SparseVectorStore, "hashed": HashedVectorStore}
+NOTE_BACKENDS = {"text": TextNoteStore, "sqlite": SQLiteNoteStore}
+
+
+def build_agent(
+    log_path: str,
+    use_memory: bool = False,
+    vector_backend: str = "bow",
+    snapshot_path: Optional[str] = None,
+    scoring: str = "cosine",
+    store_options: Optional[Dict[str, Any]] = None,
+    note_backend: str = "text",
+    note_options: Optional[Dict[str, Any]] = None,
+    needle_scan: str = "read",
+    file_cache_bytes: int = 0,
+    python_workers: int = 0,
+    python_options: Optional[Dict[str, Any]] = None,
+) -> ReActAgent:
+    """`store_options` go to the vector store (e.g. max_items, max_bytes, ttl_seconds, eviction, dim),
+    `note_options` to the note store (e.g. flush_bytes, flush_seconds, fsync for text logs).
+    `file_cache_bytes` > 0 shares a validated content cache across read_file calls in the process.
+    `python_workers` > 0 runs python_exec in a sandbox pool configured by `python_options`."""
     memory_dir = os.path.join("memory", "store")
-    vector_store = VectorStore()
-    tools = get_builtin_tools(memory_dir, vector_store=vector_store)
+    backend = VECTOR_BACKENDS[vector_backend]
+    options = {"scoring": scoring, **(store_options or {})}
+    # warm start from a previous run's snapshot instead of an empty index
+    if snapshot_path and os.path.exists(os.path.join(snapshot_path, "manifest.json")):
+        vector_store = backend.load(snapshot_path, mmap=True, **options)
+    else:
+        vector_store = backend(**options)
+    note_store = NOTE_BACKENDS[note_backend](memory_dir, **(note_options or {}))
+    tools = get_builtin_tools(
+        memory_dir,
+        vector_store=vector_store,
+        note_store=note_store,
+        file_cache_bytes=file_cache_bytes,
+        python_workers=python_workers,
+        python_options=python_options,
+    )
+    # chunk spans and vector ids of already-indexed documents, kept across runs
+    doc_index = DocIndex(index_path(memory_dir, vector_backend, snapshot_path))
     logger = JSONLLogger(log_path)
-    memory = MemoryManager(memory_dir)
+    memory = MemoryManager(memory_dir, store=note_store, cache=tools["search_memory"].cache)
     mode = "both" if use_memory else "none"
-    return ReActAgent(tools=tools, logger=logger, memory=memory, memory_mode=mode)
+    return ReActAgent(
+        tools=tools,
+        logger=logger,
+        memory=memory,
+        memory_mode=mode,
+        vector_store=vector_store,
+        snapshot_path=snapshot_path,
+        # BM25 down-weights filler tokens, so the chunk holding the key ranks first
+        retrieval_top_k=1 if scoring == "bm25" else 3,
+        needle_scan=needle_scan,
+        doc_index=doc_index,
+    )
@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional, Pattern, Tuple
+
+NEEDLE_BLOCK_CHARS = 1 << 16
+# longest `NEEDLE: <key> -> <value>` sentence that may straddle two blocks
+NEEDLE_OVERLAP_CHARS = 1024
+_WORD_RE = re.compile(r"\S+")
+
+
+@lru_cache(maxsize=1024)
+def needle_patterns(key: str) -> Tuple[Pattern, Pattern]:
+    """(`NEEDLE: <key> -> <value>`, `<key>: <value>` fallback) patterns for a key, compiled once."""
+    return (
+        re.compile(rf"NEEDLE\s*:\s*{re.escape(key)}\s*->\s*([^\s]+)"),
+        re.compile(rf"{re.escape(key)}\s*:\s*(\S+)"),
+    )
+
+
+@lru_cache(maxsize=256)
+def _multi_patterns(keys: Tuple[str, ...]) -> Tuple[Pattern, Pattern]:
+    alternation = "|".join(re.escape(k) for k in keys)
+    return (
+        re.compile(rf"NEEDLE\s*:\s*({alternation})\s*->\s*([^\s]+)"),
+        re.compile(rf"({alternation})\s*:\s*(\S+)"),
+    )
+
+
+def clean_value(raw: str) -> str:
+    return raw.strip().strip(".,;:!?")
+
+
+def extract_needles(text: str, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Value for every key, from one pass over `text` per pattern rather than one per key.
+
+    Per key the result matches single-key extraction: the first
+    `NEEDLE: <key> -> <value>` in the text, else the first `<key>: <value>`,
+    else None. The fallback pass only runs if some key is still missing.
+    """
+    found: Dict[str, Optional[str]] = dict.fromkeys(keys)
+    if not text or not found:
+        return found
+    if len(found) == 1:
+        (key,) = found
+        for pattern in needle_patterns(key):
+            m = pattern.search(text)
+            if m:
+                found[key] = clean_value(m.group(1))
+                break
+        return found
+    # longest first, so a key that is a prefix of another cannot shadow it
+    order = tuple(sorted(found, key=lambda k: (-len(k), k)))
+    missing = set(order)
+    for pattern in _multi_patterns(order):
+        m = pattern.search(text)
+        while m:
+            key = m.group(1)
+            if key in missing:
+                found[key] = clean_value(m.group(2))
+                missing.discard(key)
+                if not missing:
+                    return found
+            # resume just past the match start, so one key's match cannot hide another's
+            m = pattern.search(text, m.start() + 1)
+    return found
+
+
+class NeedleScan(NamedTuple):
+    value: Optional[str]
+    head: str  # start of the scanned text, for step logs
+    chars_read: int
+
+
+def _take_words(block: str, words_left: int, in_word: bool) -> Tuple[str, int, bool]:
+    """Cut `block` after `words_left` more words; a word carried over from the last block is not recounted."""
+    for m in _WORD_RE.finditer(block):
+        if m.start() == 0 and in_word:
+            continue
+        if words_left == 0:
+            return block[: m.start()], 0, True
+        words_left -= 1
+    return block, words_left, False
+
+
+def scan_needle(
+    path: str,
+    key: str,
+    max_words: Optional[int] = None,
+    block_chars: int = NEEDLE_BLOCK_CHARS,
+    overlap: int = NEEDLE_OVERLAP_CHARS,
+) -> NeedleScan:
+    """Stream `path` in blocks and stop at the first `NEEDLE: <key> -> <value>`.
+
+    Gives the same answer as running the agent's extraction over the first
+    `max_words` words (the whole file if None): the first needle sentence
+    wins, else the first `<key>: <value>` seen. Consecutive blocks overlap
+    by `overlap` characters so a sentence split across them is still found,
+    and a match running into the end of a block waits for the next one in
+    case its value continues there. Memory stays O(block_chars).
+    """
+    primary, fallback = needle_patterns(key)
+    fallback_value: Optional[str] = None
+    head = ""
+    carry = ""
+    chars_read = 0
+    words_left = max_words
+    in_word = False
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_chars)
+            chars_read += len(block)
+            last = len(block) < block_chars
+            if words_left is not None:
+                raw = block
+                block, words_left, done = _take_words(block, words_left, in_word)
+                last = last or done
+                in_word = bool(raw) and not raw[-1].isspace()
+            head = head or block[:500]
+            buf = carry + block
+            m = primary.search(buf)
+            if m and (last or m.end() < len(buf)):
+                return NeedleScan(clean_value(m.group(1)), head, chars_read)
+            keep = len(buf) - overlap
+            if m:
+                keep = min(keep, m.start())
+            if fallback_value is None:
+                fm = fallback.search(buf)
+                if fm and (last or fm.end() < len(buf)):
+                    fallback_value = clean_value(fm.group(1))
+                elif fm:
+                    keep = min(keep, fm.start())
+            if last:
+                return NeedleScan(fallback_value, head, chars_read)
+            carry = buf[max(keep, 0) :]
@@ -60,6 +60,8 @@ console = Console(theme=THEME, highlight=False)
 # ── paths ─────────────────────────────────────────────────────────────────────
 DEMO_DIR = ROOT / "demo"
 SAMPLE_TASK_PATH = DEMO_DIR / "sample_task.jsonl"
+# conditions re-read the same docs; keep them decoded between runs
+FILE_CACHE_BYTES = 64 << 20
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -116,21 +118,26 @@ def run_agent_with_capture(task: Dict[str, Any], memory_mode: str) -> Tuple[str,
     """Run the ReActAgent and capture its step trace."""
     from agent.loop import ReActAgent
     from agent.logger import JSONLLogger
+    from memory.facts import FactIndex
     from memory.memory import MemoryManager
+    from memory.note_log import session_log
     from memory.vector_store import VectorStore
     from tools.builtin import get_builtin_tools
 
     memory_dir = str(ROOT / "memory" / "store_demo")  # isolated store for demo
     os.makedirs(memory_dir, exist_ok=True)
 
-    # Clean up any leftover demo notes so runs are independent
-    needle_notes = Path(memory_dir) / "needle.notes.txt"
-    if needle_notes.exists():
-        needle_notes.unlink()
+    # Clean up any leftover demo notes, facts and document index so runs are independent
+    session_log(memory_dir, "needle").clear()
+    leftovers = [FactIndex(memory_dir).path("needle")]
+    leftovers += [os.path.join(memory_dir, name) for name in os.listdir(memory_dir) if name.startswith("doc_index.")]
+    for path in leftovers:
+        if os.path.exists(path):
+            os.remove(path)
 
     vector_store = VectorStore()
-    tools = get_builtin_tools(memory_dir, vector_store=vector_store)
-    memory = MemoryManager(memory_dir)
+    tools = get_builtin_tools(memory_dir, vector_store=vector_store, file_cache_bytes=FILE_CACHE_BYTES)
+    memory = MemoryManager(memory_dir, cache=tools["search_memory"].cache)
 
     capture = StepCapture()
 
@@ -554,8 +561,8 @@ def run_full_eval() -> None:
             os.makedirs(memory_dir, exist_ok=True)
 
             vector_store = VectorStore()
-            tools = get_builtin_tools(memory_dir, vector_store=vector_store)
-            memory = MemoryManager(memory_dir)
+            tools = get_builtin_tools(memory_dir, vector_store=vector_store, file_cache_bytes=FILE_CACHE_BYTES)
+            memory = MemoryManager(memory_dir, cache=tools["search_memory"].cache)
             capture = StepCapture()
 
             agent = ReActAgent(
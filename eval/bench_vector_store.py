@@ -0,0 +1,272 @@
+"""Benchmark VectorStore backends on synthetic note chunks.
+
+Usage:
+  python3 eval/bench_vector_store.py --sizes 10000,100000,1000000
+  python3 eval/bench_vector_store.py --ingest   # per-note vs batched note ingest
+  python3 eval/bench_vector_store.py --memory   # tracemalloc bytes per indexed chunk
+  python3 eval/bench_vector_store.py --hashed --sizes 100000   # hashed embeddings vs exact cosine
+  python3 eval/bench_vector_store.py --many --sizes 100000 --queries 1000   # search loop vs search_many
+  python3 eval/bench_vector_store.py --lsh --sizes 100000   # MinHash LSH recall@3 vs brute force
+"""
+import argparse
+import math
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from memory.hashed_store import HashedVectorStore
+from memory.sparse_store import SparseVectorStore
+from memory.vector_store import VectorStore, content_hash, make_vid, vectorize
+from tools.builtin import AppendNoteTool
+
+FILLER_WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore magna aliqua".split()
+
+
+def make_chunks(n: int, chunk_words: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = [rng.choice(FILLER_WORDS) for _ in range(chunk_words)]
+        # a few rarer tokens so the vocabulary grows with the corpus
+        words.append(f"k{rng.randrange(n)}")
+        words.append(f"doc{i // 30}")
+        yield " ".join(words)
+
+
+def bench(store_cls, n: int, chunk_words: int, queries) -> dict:
+    store = store_cls()
+    t0 = time.perf_counter()
+    for chunk in make_chunks(n, chunk_words):
+        store.add(chunk)
+    build_s = time.perf_counter() - t0
+    store.search(queries[0], top_k=3)  # warm lazily built structures
+    t0 = time.perf_counter()
+    for q in queries:
+        store.search(q, top_k=3)
+    search_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+    return {"build_s": build_s, "search_ms": search_ms}
+
+
+def bench_ingest(store_cls, doc_words: int = 8000, chunk_size: int = 300, repeats: int = 20) -> dict:
+    """Time chunking one needle-sized doc into notes, one call per chunk vs one batch.
+
+    Note logs are buffered, so each timing includes closing the tool, which
+    writes the buffered notes out.
+    """
+    words = next(make_chunks(1, doc_words)).split()
+    chunks = [f"doc_chunk: {' '.join(words[i : i + chunk_size])}" for i in range(0, len(words), chunk_size)]
+    timings = {"per_note_ms": 0.0, "batched_ms": 0.0}
+    for _ in range(repeats):
+        for label in timings:
+            with tempfile.TemporaryDirectory() as tmp:
+                tool = AppendNoteTool(tmp, vector_store=store_cls())
+                t0 = time.perf_counter()
+                if label == "per_note_ms":
+                    for chunk in chunks:
+                        tool.run(note=chunk, session="needle")
+                else:
+                    tool.append_notes(chunks, session="needle")
+                tool.close()
+                timings[label] += (time.perf_counter() - t0) * 1000 / repeats
+    return timings
+
+
+def _dict_layout(chunks, metadata):
+    """Reference: the earlier per-item layout (dict record + Counter, uuid string ids)."""
+    items, postings, by_hash = {}, {}, {}
+    prefix = make_vid("default")
+    for i, text in enumerate(chunks):
+        vid = f"{prefix}-{i}"
+        vec = vectorize(text)
+        digest = content_hash(text)
+        items[vid] = {"text": text, "vec": vec, "norm": 1.0, "len": sum(vec.values()), "meta": dict(metadata), "seq": i, "hash": digest, "refs": 1}
+        by_hash[digest] = vid
+        for tok, count in vec.items():
+            postings.setdefault(tok, {})[vid] = count
+    return items, postings, by_hash
+
+
+def bench_memory(n: int, chunk_words: int) -> dict:
+    """Traced bytes per indexed chunk, excluding the chunk text the caller already holds."""
+    chunks = list(make_chunks(n, chunk_words))
+    metadata = {"session": "default", "source": "note"}
+    result = {}
+    for name in ("dict", "bow", "sparse"):
+        tracemalloc.start()
+        if name == "dict":
+            kept = _dict_layout(chunks, metadata)
+        else:
+            kept = {"bow": VectorStore, "sparse": SparseVectorStore}[name]()
+            kept.add_many(chunks, metadata=metadata)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        result[name] = current / n
+    return result
+
+
+def bench_many(store_cls, n: int, chunk_words: int, queries) -> dict:
+    """Time answering every query with `search` in a loop vs one `search_many` call."""
+    store = store_cls()
+    store.add_many(list(make_chunks(n, chunk_words)))
+    store.search(queries[0], top_k=3)
+    t0 = time.perf_counter()
+    for q in queries:
+        store.search(q, top_k=3)
+    loop_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    store.search_many(queries, top_k=3)
+    return {"loop_ms": loop_ms, "batch_ms": (time.perf_counter() - t0) * 1000}
+
+
+def make_note_clusters(n: int, chunk_words: int, cluster: int = 5, vocab: int = 50000, seed: int = 0):
+    """Notes in clusters of `cluster` revisions of one base note (20% of words replaced), plus a base per cluster for queries."""
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab)]
+    notes, bases = [], []
+    for _ in range(n // cluster):
+        base = [rng.choice(words) for _ in range(chunk_words)]
+        bases.append(base)
+        for _ in range(cluster):
+            notes.append(" ".join(w if rng.random() < 0.8 else rng.choice(words) for w in base))
+    return notes, bases, words
+
+
+def bench_lsh(n: int, chunk_words: int, n_queries: int, configs=((16, 2), (32, 2), (16, 4), (32, 4), (64, 4)), top_k: int = 3) -> list:
+    """Search time, candidate count and tie-aware recall@k of LSH configs against brute force."""
+    notes, bases, words = make_note_clusters(n, chunk_words)
+    rng = random.Random(1)
+    queries = [" ".join(w if rng.random() < 0.8 else rng.choice(words) for w in rng.choice(bases)) for _ in range(n_queries)]
+    exact = VectorStore()
+    exact.add_many(notes)
+    t0 = time.perf_counter()
+    kth = [exact.search(q, top_k=top_k)[-1][1] for q in queries]
+    rows = [{"bands": "-", "rows": "-", "search_ms": (time.perf_counter() - t0) * 1000 / n_queries, "candidates": None, "recall": 1.0}]
+    for bands, band_rows in configs:
+        store = VectorStore(lsh_bands=bands, lsh_rows=band_rows)
+        store.add_many(notes)
+        t0 = time.perf_counter()
+        results = [store.search(q, top_k=top_k) for q in queries]
+        search_ms = (time.perf_counter() - t0) * 1000 / n_queries
+        recalled = sum(score >= threshold - 1e-9 for hits, threshold in zip(results, kth) for _, score in hits)
+        part = store.partitions["default"]
+        candidates = sum(len(part.lsh.candidates(store.vocab[t] for t in vectorize(q) if t in store.vocab)) for q in queries)
+        rows.append({"bands": bands, "rows": band_rows, "search_ms": search_ms, "candidates": candidates / n_queries, "recall": recalled / (top_k * n_queries)})
+    return rows
+
+
+def _exact_cosine(query: str, text: str) -> float:
+    qvec, dvec = vectorize(query), vectorize(text)
+    dot = sum(v * dvec.get(tok, 0) for tok, v in qvec.items())
+    qnorm = math.sqrt(sum(v * v for v in qvec.values())) or 1.0
+    dnorm = math.sqrt(sum(v * v for v in dvec.values())) or 1.0
+    return dot / (qnorm * dnorm)
+
+
+def bench_hashed(n: int, chunk_words: int, queries, top_k: int = 3, dims=(256, 1024, 4096)) -> list:
+    """Search time and recall@k of hashed embeddings against exact cosine.
+
+    A hashed hit counts as recalled if its exact cosine reaches the exact
+    k-th best score, so ties among equally good chunks are not penalized.
+    """
+    chunks = list(make_chunks(n, chunk_words))
+    exact = SparseVectorStore()
+    exact.add_many(chunks)
+    t0 = time.perf_counter()
+    kth = []
+    for q in queries:
+        hits = exact.search(q, top_k=top_k)
+        kth.append(hits[-1][1])
+    rows = [{"backend": "exact", "dim": "-", "dtype": "-", "search_ms": (time.perf_counter() - t0) * 1000 / len(queries), "recall": 1.0, "matrix_mb": 0.0}]
+    for dim in dims:
+        for dtype in ("float16", "float32"):
+            store = HashedVectorStore(dim=dim, dtype=dtype)
+            store.add_many(chunks)
+            store.search(queries[0], top_k=top_k)
+            t0 = time.perf_counter()
+            results = [store.search(q, top_k=top_k) for q in queries]
+            search_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            recalled = 0
+            for q, hits, threshold in zip(queries, results, kth):
+                recalled += sum(_exact_cosine(q, store.get_text(vid)) >= threshold - 1e-9 for vid, _ in hits)
+            matrix_mb = sum(p.matrix.nbytes for p in store.partitions.values()) / 1e6
+            rows.append({"backend": "hashed", "dim": dim, "dtype": dtype, "search_ms": search_ms, "recall": recalled / (top_k * len(queries)), "matrix_mb": matrix_mb})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated chunk counts")
+    parser.add_argument("--chunk-words", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--max-bow", type=int, default=100000, help="skip the pure-Python backend above this size")
+    parser.add_argument("--ingest", action="store_true", help="benchmark note ingest for an 8000-word doc instead")
+    parser.add_argument("--memory", action="store_true", help="report traced bytes per indexed chunk instead")
+    parser.add_argument("--lsh", action="store_true", help="report MinHash LSH recall@3 and speed against brute force instead")
+    parser.add_argument("--many", action="store_true", help="time a batch of queries with search vs search_many instead")
+    parser.add_argument("--hashed", action="store_true", help="report hashed-embedding recall@3 and speed against exact cosine instead")
+    args = parser.parse_args()
+
+    backends = {"bow": VectorStore, "sparse": SparseVectorStore}
+    if args.ingest:
+        print(f"{'backend':<8} {'per_note_ms':>12} {'batched_ms':>11}")
+        for name, cls in backends.items():
+            res = bench_ingest(cls)
+            print(f"{name:<8} {res['per_note_ms']:>12.2f} {res['batched_ms']:>11.2f}")
+        return
+    if args.memory:
+        print(f"{'chunks':>9} {'dict_B':>8} {'bow_B':>8} {'sparse_B':>9} {'dict/bow':>9}")
+        for n in [int(s) for s in args.sizes.split(",")]:
+            res = bench_memory(n, args.chunk_words)
+            print(f"{n:>9} {res['dict']:>8.0f} {res['bow']:>8.0f} {res['sparse']:>9.0f} {res['dict'] / res['bow']:>9.1f}")
+        return
+    rng = random.Random(1)
+    if args.lsh:
+        print(f"{'chunks':>9} {'bands':>6} {'rows':>5} {'search_ms':>10} {'candidates':>11} {'recall@3':>9}")
+        for n in [int(s) for s in args.sizes.split(",")]:
+            for row in bench_lsh(n, args.chunk_words, args.queries):
+                candidates = "-" if row["candidates"] is None else f"{row['candidates']:.1f}"
+                print(f"{n:>9} {row['bands']:>6} {row['rows']:>5} {row['search_ms']:>10.2f} {candidates:>11} {row['recall']:>9.3f}")
+        return
+    if args.many:
+        print(f"{'backend':<8} {'chunks':>9} {'queries':>8} {'loop_ms':>10} {'batch_ms':>10}")
+        for n in [int(s) for s in args.sizes.split(",")]:
+            # needle-style key lookups, one per query
+            queries = [f"k{rng.randrange(n)}" for _ in range(args.queries)]
+            backends["hashed"] = HashedVectorStore
+            for name, cls in backends.items():
+                if name == "bow" and n > args.max_bow:
+                    print(f"{name:<8} {n:>9} {'skipped':>8}")
+                    continue
+                res = bench_many(cls, n, args.chunk_words, queries)
+                print(f"{name:<8} {n:>9} {len(queries):>8} {res['loop_ms']:>10.1f} {res['batch_ms']:>10.1f}")
+        return
+    if args.hashed:
+        print(f"{'backend':<8} {'chunks':>9} {'dim':>5} {'dtype':>8} {'search_ms':>10} {'recall@3':>9} {'matrix_mb':>10}")
+        for n in [int(s) for s in args.sizes.split(",")]:
+            # rare-token lookups, a rare token plus filler, and filler-only queries
+            queries = [[f"k{rng.randrange(n)}", f"doc{rng.randrange(n // 30 or 1)} lorem", "lorem dolor sit"][i % 3] for i in range(args.queries)]
+            for row in bench_hashed(n, args.chunk_words, queries):
+                print(
+                    f"{row['backend']:<8} {n:>9} {row['dim']:>5} {row['dtype']:>8} {row['search_ms']:>10.2f}"
+                    f" {row['recall']:>9.3f} {row['matrix_mb']:>10.1f}"
+                )
+        return
+    print(f"{'backend':<8} {'chunks':>9} {'build_s':>9} {'search_ms':>10}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        queries = [f"k{rng.randrange(n)}" if i % 2 else "lorem dolor" for i in range(args.queries)]
+        for name, cls in backends.items():
+            if name == "bow" and n > args.max_bow:
+                print(f"{name:<8} {n:>9} {'skipped':>9}")
+                continue
+            res = bench(cls, n, args.chunk_words, queries)
+            print(f"{name:<8} {n:>9} {res['build_s']:>9.2f} {res['search_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compact episodic notes: drop duplicates, expired and over-cap lines, rotate into segments.
+
+Usage:
+  python3 eval/compact_notes.py --memory-dir memory/store --retention-days 30 --max-bytes 1000000
+  python3 eval/compact_notes.py --session needle --gzip    # gzip the rewritten (cold) segments
+  python3 eval/compact_notes.py --note-backend sqlite --max-bytes 1000000
+
+Text logs only rewrite sealed segments, so an agent may keep appending while this runs;
+--seal also folds in the active segment (only when nothing else is appending).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from memory.note_log import TextNoteStore
+from memory.sqlite_notes import SQLiteNoteStore
+
+
+def compact_notes(
+    memory_dir: str,
+    note_backend: str = "text",
+    sessions: list | None = None,
+    retention_seconds: float | None = None,
+    max_bytes: int | None = None,
+    compress: bool = False,
+    seal: bool = False,
+) -> dict:
+    """Per-session compaction stats."""
+    store = TextNoteStore(memory_dir) if note_backend == "text" else SQLiteNoteStore(memory_dir)
+    options = {"retention_seconds": retention_seconds, "max_bytes": max_bytes}
+    if note_backend == "text":
+        options.update(compress=compress, seal=seal)
+    with store:
+        return {session: store.compact(session, **options) for session in sessions or store.sessions()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--memory-dir", default=str(ROOT / "memory" / "store"), help="directory holding the notes")
+    parser.add_argument("--note-backend", choices=["text", "sqlite"], default="text", help="episodic note storage")
+    parser.add_argument("--session", action="append", default=None, help="session to compact (repeatable; default all)")
+    parser.add_argument("--retention-days", type=float, default=None, help="drop notes older than this")
+    parser.add_argument("--max-bytes", type=int, default=None, help="keep at most this many bytes of newest notes per session")
+    parser.add_argument("--gzip", action="store_true", help="gzip rewritten segments (text backend)")
+    parser.add_argument("--seal", action="store_true", help="compact the active segment too (text backend, no concurrent writers)")
+    args = parser.parse_args()
+    stats = compact_notes(
+        args.memory_dir,
+        note_backend=args.note_backend,
+        sessions=args.session,
+        retention_seconds=args.retention_days * 86400 if args.retention_days is not None else None,
+        max_bytes=args.max_bytes,
+        compress=args.gzip,
+        seal=args.seal,
+    )
+    print(json.dumps(stats, indent=2))
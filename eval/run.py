@@ -63,7 +63,20 @@ def bucket_key(task):
     return ">5000"
 
 
-def run_eval(condition: str = "baseline", memory_mode: str = "none"):
+def run_eval(
+    condition: str = "baseline",
+    memory_mode: str = "none",
+    vector_backend: str = "bow",
+    vector_snapshot: str | None = None,
+    scoring: str = "cosine",
+    store_options: dict | None = None,
+    note_backend: str = "text",
+    note_options: dict | None = None,
+    needle_scan: str = "read",
+    file_cache_bytes: int = 0,
+    python_workers: int = 0,
+    python_options: dict | None = None,
+):
     needle_path, long_path = ensure_tasks()
     tasks = list(load_jsonl(needle_path)) + list(load_jsonl(long_path))
 
@@ -72,7 +85,20 @@ def run_eval(condition: str = "baseline", memory_mode: str = "none"):
     RUNS_DIR.mkdir(exist_ok=True)
     REPORT_DIR.mkdir(exist_ok=True)
 
-    agent = build_agent(str(log_path), use_memory=(memory_mode != "none"))
+    agent = build_agent(
+        str(log_path),
+        use_memory=(memory_mode != "none"),
+        vector_backend=vector_backend,
+        snapshot_path=vector_snapshot,
+        scoring=scoring,
+        store_options=store_options,
+        note_backend=note_backend,
+        note_options=note_options,
+        needle_scan=needle_scan,
+        file_cache_bytes=file_cache_bytes,
+        python_workers=python_workers,
+        python_options=python_options,
+    )
     agent.memory_mode = memory_mode
 
     results = []
@@ -120,10 +146,25 @@ def run_eval(condition: str = "baseline", memory_mode: str = "none"):
 
     # log summary line to run log
     agent.logger.log_summary({"condition": condition, "table": table_lines})
+    agent.close()
 
     print("Run ID:", run_id)
     print("Log:", log_path)
     print("Report:", report_path)
+    if memory_mode != "none":
+        print("Dedup (notes):", agent.tools["append_note"].dedup_stats)
+        print("Dedup (vectors):", agent.vector_store.dedup_stats)
+        if agent.vector_store.capacity.enabled:
+            print("Evictions:", agent.vector_store.eviction_stats)
+        cache = agent.tools["search_memory"].cache
+        if cache is not None:
+            print("Search cache:", cache.stats())
+    file_cache = agent.tools["read_file"].cache
+    if file_cache is not None:
+        print("File cache:", file_cache.stats())
+    pool = agent.tools["python_exec"].pool
+    if pool is not None:
+        print("Python sandbox:", pool.stats)
     print("\nResults table:")
     for row in table_lines:
         print(
@@ -135,5 +176,42 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--condition", default="baseline", help="label for this run")
     parser.add_argument("--memory", choices=["none", "summary", "retrieval", "both"], default="none", help="memory mode")
+    parser.add_argument("--vector-backend", choices=["bow", "sparse", "hashed"], default="bow", help="vector store backend")
+    parser.add_argument("--needle-scan", choices=["read", "stream"], default="read", help="read needle docs whole or stream them with early exit")
+    parser.add_argument("--note-backend", choices=["text", "sqlite"], default="text", help="episodic note storage")
+    parser.add_argument("--note-fsync", action="store_true", help="fsync each flushed batch of text notes")
+    parser.add_argument("--file-cache-mb", type=int, default=0, help="cache read_file contents up to this many MiB (0 disables)")
+    parser.add_argument("--python-workers", type=int, default=0, help="run python_exec in this many sandboxed worker processes (0 runs in-process)")
+    parser.add_argument("--python-timeout", type=float, default=10.0, help="wall-clock seconds per sandboxed python_exec call")
+    parser.add_argument("--python-max-mb", type=int, default=512, help="memory a sandbox worker may grow by, in MiB")
+    parser.add_argument("--vector-snapshot", default=None, help="directory to warm-start the vector store from and save it to (sparse maps it as is; bow and hashed rebuild their in-memory index from it, in time linear in its rows)")
+    parser.add_argument("--scoring", choices=["cosine", "bm25"], default="cosine", help="vector store ranking")
+    parser.add_argument("--max-items", type=int, default=None, help="cap on indexed chunks (evicts beyond it)")
+    parser.add_argument("--max-bytes", type=int, default=None, help="approximate byte cap for the vector store")
+    parser.add_argument("--ttl", type=float, default=None, help="seconds before an indexed chunk expires")
+    parser.add_argument("--eviction", choices=["lru", "oldest"], default="lru", help="eviction policy when over capacity")
+    parser.add_argument("--hash-dim", type=int, default=1024, help="embedding width for the hashed backend")
+    parser.add_argument("--hash-dtype", choices=["float32", "float16"], default="float32", help="embedding dtype for the hashed backend")
     args = parser.parse_args()
-    run_eval(condition=args.condition, memory_mode=args.memory)
+    store_options = {
+        "max_items": args.max_items,
+        "max_bytes": args.max_bytes,
+        "ttl_seconds": args.ttl,
+        "eviction": args.eviction,
+    }
+    if args.vector_backend == "hashed":
+        store_options.update(dim=args.hash_dim, dtype=args.hash_dtype)
+    run_eval(
+        condition=args.condition,
+        memory_mode=args.memory,
+        vector_backend=args.vector_backend,
+        vector_snapshot=args.vector_snapshot,
+        scoring=args.scoring,
+        store_options=store_options,
+        note_backend=args.note_backend,
+        note_options={"fsync": True} if args.note_fsync and args.note_backend == "text" else None,
+        needle_scan=args.needle_scan,
+        file_cache_bytes=args.file_cache_mb << 20,
+        python_workers=args.python_workers,
+        python_options={"timeout": args.python_timeout, "max_rss_bytes": args.python_max_mb << 20},
+    )
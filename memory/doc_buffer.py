@@ -0,0 +1,102 @@
+import hashlib
+import mmap
+import os
+import re
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+CHUNK_PREFIX = "doc_chunk: "
+_WORD_RE = re.compile(r"\S+")
+
+
+class DocSpan(NamedTuple):
+    """A document chunk stored by reference: byte offsets into a shared document buffer."""
+
+    doc_id: str
+    start: int
+    end: int
+
+
+# what the vector stores accept and hold per item: the text itself, or a span standing for it
+Text = Union[str, DocSpan]
+# resident size of a span-backed item's reference (tuple, id string shared with the buffer, two ints)
+SPAN_BYTES = 120
+
+
+class DocBuffer:
+    """One document mapped read-only; its id is the sha1 of its bytes.
+
+    Pages are shared with the OS page cache rather than copied onto the
+    heap. `signature` is the file's (inode, size, mtime_ns) at mapping time;
+    once the file no longer matches it the buffer is stale and its spans
+    read as empty, rather than as whatever now sits at those offsets.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+            # an empty file cannot be mapped
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+        self.doc_id = hashlib.sha1(self.data).hexdigest()
+
+    def valid(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return (st.st_ino, st.st_size, st.st_mtime_ns) == self.signature
+
+    def text(self) -> str:
+        """The whole document, decoded (a transient copy, for chunking)."""
+        return bytes(self.data).decode("utf-8")
+
+    def chunk(self, start: int, end: int) -> str:
+        return CHUNK_PREFIX + " ".join(self.data[start:end].decode("utf-8").split())
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+_BY_PATH: Dict[str, DocBuffer] = {}
+_BY_ID: Dict[str, DocBuffer] = {}
+
+
+def open_document(path: str) -> DocBuffer:
+    """Shared buffer for a document, remapped (and re-hashed) only when the file has changed."""
+    path = os.path.abspath(path)
+    buf = _BY_PATH.get(path)
+    if buf is None or not buf.valid():
+        buf = _BY_PATH[path] = DocBuffer(path)
+        _BY_ID[buf.doc_id] = buf
+    return buf
+
+
+def span_text(span: DocSpan) -> str:
+    """Materialize a span as its chunk note; empty if its document is gone or has changed."""
+    buf = _BY_ID.get(span.doc_id)
+    if buf is None or not buf.valid():
+        return ""
+    return buf.chunk(span.start, span.end)
+
+
+def resolve_text(text: Text) -> str:
+    return text if isinstance(text, str) else span_text(text)
+
+
+def chunk_spans(text: str, chunk_words: int) -> List[Tuple[int, int]]:
+    """(start, end) byte offsets, within `text` encoded as UTF-8, of consecutive `chunk_words`-word chunks."""
+    words = [m.span() for m in _WORD_RE.finditer(text)]
+    spans = [(words[i][0], words[min(i + chunk_words, len(words)) - 1][1]) for i in range(0, len(words), chunk_words)]
+    if text.isascii():
+        return spans
+    byte_spans = []
+    pos = nbytes = 0
+    for start, end in spans:
+        nbytes += len(text[pos:start].encode("utf-8"))
+        first = nbytes
+        nbytes += len(text[start:end].encode("utf-8"))
+        byte_spans.append((first, nbytes))
+        pos = end
+    return byte_spans
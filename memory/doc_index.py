@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from memory.facts import Fact
+
+
+def index_path(memory_dir: str, backend: str, snapshot_path: Optional[str] = None) -> str:
+    """Index file for one vector backend and snapshot: vector ids mean nothing to any other store."""
+    name = f"doc_index.{backend}"
+    if snapshot_path:
+        name += "." + hashlib.sha1(os.path.abspath(snapshot_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(memory_dir, name + ".json")
+
+
+class DocIndex:
+    """Which documents were chunked into a session's memory, and as which vectors.
+
+    Entries are keyed by session and absolute path and hold the document's
+    size, mtime and content hash (its `DocBuffer` id), the byte spans of its
+    chunks, the vector id of each chunk and the facts found in it. A
+    document whose stat still matches
+    (or whose content hash does, after a touch) can be attached again
+    without re-chunking or re-embedding. The index is a JSON file rewritten
+    on every record, so it survives restarts; vector ids are re-checked
+    against the store before they are trusted. Each vector backend and
+    snapshot gets its own file (see `index_path`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def _key(doc_path: str, session: str) -> str:
+        return f"{session}:{os.path.abspath(doc_path)}"
+
+    def lookup(self, doc_path: str, doc_id: str, session: str, chunk_words: int) -> Optional[Dict]:
+        """Entry for this exact document content and chunking, or None."""
+        entry = self.entries.get(self._key(doc_path, session))
+        if entry is None or entry["chunk_words"] != chunk_words:
+            return None
+        st = os.stat(doc_path)
+        if (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            return entry
+        if entry["sha1"] != doc_id:
+            return None
+        entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        self._save()
+        return entry
+
+    def record(
+        self,
+        doc_path: str,
+        doc_id: str,
+        session: str,
+        chunk_words: int,
+        spans: List[Tuple[int, int]],
+        vids: List,
+        facts: List[Tuple[str, Fact]],
+    ) -> None:
+        st = os.stat(doc_path)
+        self.entries[self._key(doc_path, session)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": doc_id,
+            "chunk_words": chunk_words,
+            "spans": [list(span) for span in spans],
+            "vids": list(vids),
+            "facts": [[key, *fact] for key, fact in facts],
+        }
+        self._save()
+
+    @staticmethod
+    def facts(entry: Dict) -> List[Tuple[str, Fact]]:
+        return [(key, Fact(*rest)) for key, *rest in entry["facts"]]
+
+    def _save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from memory.doc_buffer import SPAN_BYTES, Text
+
+EVICTION_POLICIES = ("lru", "oldest")
+
+
+def approx_item_bytes(text: Text, n_terms: int) -> int:
+    """Rough resident size of one indexed item: text (or span), term entries, record overhead."""
+    size = len(text.encode("utf-8")) if isinstance(text, str) else SPAN_BYTES
+    return size + 48 * n_terms + 240
+
+
+class CapacityPolicy:
+    """Tracks item age, recency and size for a capacity-bounded store.
+
+    The store registers every item with `admit`, reports search hits with
+    `touch`, and asks `victims` which ids to evict. Ids are whatever the
+    store addresses items by internally (packed ints for `VectorStore`,
+    id strings for the CSR and hashed stores). Whole partitions dropped
+    by the store are released in O(1) with `release`; their ids stay in the
+    queues and are skipped lazily via the store's `exists` callback.
+    """
+
+    def __init__(
+        self,
+        max_items: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        policy: str = "lru",
+        clock: Callable[[], float] = time.time,
+    ):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.policy = policy
+        self.clock = clock
+        self._created: "OrderedDict[Hashable, Tuple[float, int]]" = OrderedDict()
+        self._recency: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.items = 0
+        self.bytes = 0
+        self.stats: Dict[str, int] = {"evicted": 0, "expired": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return any(v is not None for v in (self.max_items, self.max_bytes, self.ttl_seconds))
+
+    def admit(self, vid: Hashable, nbytes: int) -> None:
+        self._created[vid] = (self.clock(), nbytes)
+        self._recency[vid] = None
+        self.items += 1
+        self.bytes += nbytes
+
+    def touch(self, vid: Hashable) -> None:
+        if self.policy == "lru" and vid in self._recency:
+            self._recency.move_to_end(vid)
+
+    def release(self, count: int, nbytes: int) -> None:
+        """Account for items removed in bulk (a dropped partition)."""
+        self.items -= count
+        self.bytes -= nbytes
+
+    def victims(self, exists: Callable[[Hashable], bool]) -> Iterator[Tuple[Hashable, str]]:
+        """Yield (vid, reason) for items to evict, expired ones first.
+
+        Each yielded id is already forgotten by the policy; the caller must
+        remove it from its indexes before pulling the next one.
+        """
+        if self.ttl_seconds is not None:
+            cutoff = self.clock() - self.ttl_seconds
+            while self._created:
+                vid, (created, _) = next(iter(self._created.items()))
+                if not exists(vid):
+                    self._discard(vid, counted=False)
+                    continue
+                if created > cutoff:
+                    break
+                self._discard(vid)
+                self.stats["expired"] += 1
+                yield vid, "expired"
+        while self._over_capacity():
+            queue = self._recency if self.policy == "lru" else self._created
+            if not queue:
+                break
+            vid = next(iter(queue))
+            if not exists(vid):
+                self._discard(vid, counted=False)
+                continue
+            self._discard(vid)
+            self.stats["evicted"] += 1
+            yield vid, "evicted"
+
+    def _over_capacity(self) -> bool:
+        if self.max_items is not None and self.items > self.max_items:
+            return True
+        return self.max_bytes is not None and self.bytes > self.max_bytes
+
+    def _discard(self, vid: Hashable, counted: bool = True) -> None:
+        _, nbytes = self._created.pop(vid, (0.0, 0))
+        self._recency.pop(vid, None)
+        if counted:
+            self.items -= 1
+            self.bytes -= nbytes
@@ -0,0 +1,77 @@
+import json
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from memory.vector_store import content_hash
+
+NEEDLE_FACT_RE = re.compile(r"NEEDLE\s*:\s*(\S+)\s*->\s*(\S+)")
+
+
+class Fact(NamedTuple):
+    value: str
+    source: str  # content hash of the note the fact came from
+    offset: int  # character offset of the match within that note
+
+
+def extract_facts(note: str) -> List[Tuple[str, Fact]]:
+    """`(key, Fact)` for every `NEEDLE: <key> -> <value>` in a note."""
+    source = None
+    facts = []
+    for m in NEEDLE_FACT_RE.finditer(note):
+        source = source or content_hash(note)
+        facts.append((m.group(1), Fact(m.group(2).strip(".,;:!?"), source, m.start())))
+    return facts
+
+
+class FactIndex:
+    """Exact-key facts pulled from notes as they are stored.
+
+    Each session maps (doc, key) -> Fact, persisted as an append-only
+    `<session>.facts.jsonl` next to the notes and loaded on first use. `doc`
+    is the id of the document the notes were taken from ("" for notes that
+    are not), so a key found in one document never answers for another. A
+    key seen again in the same document keeps its latest value;
+    re-ingesting an unchanged fact writes nothing.
+    """
+
+    def __init__(self, memory_dir: str):
+        self.memory_dir = memory_dir
+        os.makedirs(memory_dir, exist_ok=True)
+        self._sessions: Dict[str, Dict[Tuple[str, str], Fact]] = {}
+
+    def path(self, session: str) -> str:
+        return os.path.join(self.memory_dir, f"{session}.facts.jsonl")
+
+    def _facts(self, session: str) -> Dict[Tuple[str, str], Fact]:
+        facts = self._sessions.get(session)
+        if facts is None:
+            facts = self._sessions[session] = {}
+            path = self.path(session)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            row = json.loads(line)
+                            facts[row.get("doc", ""), row["key"]] = Fact(row["value"], row["source"], row["offset"])
+        return facts
+
+    def add_notes(self, notes: List[str], session: str = "default", doc: str = "") -> int:
+        """Index the facts in a batch of notes from `doc`; returns how many were new or changed."""
+        return self.add([pair for note in notes for pair in extract_facts(note)], session=session, doc=doc)
+
+    def add(self, pairs: List[Tuple[str, Fact]], session: str = "default", doc: str = "") -> int:
+        """Record `(key, Fact)` pairs found in `doc`; returns how many were new or changed."""
+        facts = self._facts(session)
+        rows = []
+        for key, fact in pairs:
+            if facts.get((doc, key)) != fact:
+                facts[doc, key] = fact
+                rows.append({"doc": doc, "key": key, **fact._asdict()})
+        if rows:
+            with open(self.path(session), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row) + "\n" for row in rows))
+        return len(rows)
+
+    def get(self, key: str, session: str = "default", doc: str = "") -> Optional[Fact]:
+        return self._facts(session).get((doc, key))
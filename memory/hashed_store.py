@@ -0,0 +1,236 @@
+import hashlib
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from memory.doc_buffer import Text, resolve_text
+from memory.eviction import approx_item_bytes
+from memory.partitioned import PartitionedStore, RowPartition
+from memory.snapshot import read_snapshot, write_snapshot
+from memory.vector_store import snapshot_runs, vectorize
+
+HASH_DTYPES = ("float32", "float16")
+# float16 has no BLAS kernel; it is converted to float32 in cache-sized blocks of this many bytes
+_SCORE_BLOCK_BYTES = 1 << 20
+_SCORE_DECIMALS = 6
+# upper bound on query x row cells scored at once by `search_many`
+_SCORE_CELLS = 1 << 22
+# snapshot rows are projected this many at a time on load
+_LOAD_BLOCK = 1 << 15
+
+
+def token_bucket(token: str, dim: int) -> Tuple[int, float]:
+    """(column, sign) of a token under the hashing trick; stable across processes."""
+    h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first, ties by index."""
+    if k < len(scores):
+        cand = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[cand].min()
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[: k - len(above)]
+        cand = np.concatenate([above, ties])
+    else:
+        cand = np.arange(len(scores))
+    return cand[np.lexsort((cand, -scores[cand]))]
+
+
+class _DensePartition(RowPartition):
+    """Unit-norm hashed embeddings, one matrix row per item, for one session.
+
+    The matrix is preallocated and doubles when full.
+    """
+
+    def __init__(self, dim: int, dtype: str, capacity: int = 64):
+        super().__init__(capacity)
+        self.matrix = np.zeros((capacity, dim), dtype=dtype)
+
+    def extend(self, vids: List[str], texts: List[Text], metas: List[Dict], digests: List[str], seqs: List[int], embeddings: np.ndarray) -> None:
+        row = len(self.ids)
+        end = row + len(vids)
+        if end > len(self.matrix):
+            size = max(end, 2 * len(self.matrix))
+            matrix = np.zeros((size, self.matrix.shape[1]), dtype=self.matrix.dtype)
+            matrix[:row] = self.matrix[:row]
+            self.matrix = matrix
+            alive = np.zeros(size, dtype=bool)
+            alive[:row] = self.alive[:row]
+            self.alive = alive
+        self.matrix[row:end] = embeddings
+        self._extend_records(vids, texts, metas, digests, seqs)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine scores of every row against unit-norm float32 query rows; returns (queries, rows).
+
+        Tombstoned rows get -inf.
+        """
+        n = len(self.ids)
+        if self.matrix.dtype == np.float32:
+            out = queries @ self.matrix[:n].T
+        else:
+            out = np.empty((len(queries), n), dtype=np.float32)
+            step = max(1, _SCORE_BLOCK_BYTES // (4 * self.matrix.shape[1]))
+            buf = np.empty((step, self.matrix.shape[1]), dtype=np.float32)
+            for start in range(0, n, step):
+                block = self.matrix[start : min(n, start + step)]
+                np.copyto(buf[: len(block)], block)
+                out[:, start : start + len(block)] = queries @ buf[: len(block)].T
+        if self.dead:
+            out[:, ~self.alive[:n]] = -np.inf
+        return out
+
+    def _compact_arrays(self, keep: np.ndarray) -> None:
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+
+
+class HashedVectorStore(PartitionedStore):
+    """Fixed-dimension hashed embedding store.
+
+    Each token is hashed to one of `dim` signed columns, so a note becomes a
+    unit-norm `dim`-float row of a per-session matrix whatever the
+    vocabulary size. A search is one mat-vec plus `argpartition`. float16
+    rows halve the memory but are slower to score, as numpy converts them
+    to float32 on the fly.
+    Scores approximate the exact bag-of-words cosine of `VectorStore`: hash
+    collisions between tokens perturb them slightly, less so for larger
+    `dim` (see `eval/bench_vector_store.py --hashed`). Only cosine scoring
+    is supported; deduplication, session partitions, eviction and the
+    snapshot format are shared with the other stores.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1024,
+        dtype: str = "float32",
+        scoring: str = "cosine",
+        max_items: int | None = None,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+        eviction: str = "lru",
+    ):
+        if scoring != "cosine":
+            raise ValueError(f"HashedVectorStore only supports cosine scoring, not {scoring}")
+        if dtype not in HASH_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        super().__init__(max_items=max_items, max_bytes=max_bytes, ttl_seconds=ttl_seconds, eviction=eviction)
+        self.dim = dim
+        self.dtype = dtype
+        self.scoring = scoring
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Unit-norm hashed embeddings of `texts` as a float32 matrix."""
+        rows, cols, vals = [], [], []
+        for i, text in enumerate(texts):
+            for tok, count in vectorize(text).items():
+                bucket = self._buckets.get(tok)
+                if bucket is None:
+                    bucket = self._buckets[tok] = token_bucket(tok, self.dim)
+                rows.append(i)
+                cols.append(bucket[0])
+                vals.append(bucket[1] * count)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(out, (rows, cols), vals)
+        return _unit_rows(out)
+
+    def _new_partition(self) -> _DensePartition:
+        return _DensePartition(self.dim, self.dtype)
+
+    def _insert(
+        self,
+        part: _DensePartition,
+        vids: List[str],
+        sources: List[Text],
+        texts: List[str],
+        metas: List[Dict],
+        digests: List[str],
+        seqs: List[int],
+    ) -> None:
+        part.extend(vids, sources, metas, digests, seqs, self.embed(texts))
+
+    def _item_bytes(self, part: _DensePartition, row: int, text: Text) -> int:
+        return approx_item_bytes(text, 0) + self.dim * np.dtype(self.dtype).itemsize
+
+    def search_many(self, queries: List[str], top_k: int = 3, session: str | None = None) -> List[List[Tuple[str, float]]]:
+        """`search` for several queries at once: one mat-mat product per partition and batch of queries."""
+        parts = self._search_partitions(session)
+        if not parts or top_k <= 0:
+            return [[] for _ in queries]
+        qmat = self.embed(queries)
+        hits: List[List[Tuple[float, int, str]]] = [[] for _ in queries]
+        # score matrices are (queries x rows); bound them by batching the queries
+        step = max(1, _SCORE_CELLS // max(p.n_rows for p in parts))
+        for start in range(0, len(queries), step):
+            for part in parts:
+                scores = part.scores(qmat[start : start + step])
+                # BLAS may differ in the last bit between batch sizes; round so equal notes tie
+                np.round(scores, _SCORE_DECIMALS, out=scores)
+                for offset, row_scores in enumerate(scores):
+                    for r in _top_rows(row_scores, min(top_k, len(part))):
+                        hits[start + offset].append((float(row_scores[r]), part.seqs[r], part.ids[r]))
+        return self._rank(hits, top_k)
+
+    def save(self, path: str) -> str:
+        """Write the shared snapshot layout; term counts are not kept in memory, so texts are re-tokenized."""
+        parts = list(self.partitions.values())
+        for part in parts:
+            part.compact()
+        vocab: Dict[str, int] = {}
+        indptr, indices, data, norms = [0], [], [], []
+        for part in parts:
+            for text in part.texts:
+                vec = vectorize(resolve_text(text))
+                indices.extend(vocab.setdefault(tok, len(vocab)) for tok in vec)
+                data.extend(vec.values())
+                indptr.append(len(indices))
+                norms.append(math.sqrt(sum(c * c for c in vec.values())) or 1.0)
+        return write_snapshot(
+            path,
+            vocab=list(vocab),
+            indptr=np.asarray(indptr, dtype=np.int64),
+            indices=np.asarray(indices, dtype=np.int32),
+            data=np.asarray(data, dtype=np.float32),
+            norms=np.asarray(norms),
+            **self._snapshot_records(),
+        )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs) -> "HashedVectorStore":
+        """Project a snapshot's term counts into hashed rows without re-tokenizing any text.
+
+        Extra keyword arguments (e.g. `dim`) go to the constructor.
+        """
+        snap = read_snapshot(path, mmap=mmap)
+        store = cls(**kwargs)
+        buckets = [token_bucket(tok, store.dim) for tok in snap.vocab]
+        cols = np.asarray([c for c, _ in buckets], dtype=np.int64)
+        signs = np.asarray([s for _, s in buckets], dtype=np.float32)
+        indptr = np.asarray(snap.indptr, dtype=np.int64)
+        indices, data = np.asarray(snap.indices), np.asarray(snap.data, dtype=np.float32)
+        refs = snap.refs if snap.refs is not None else np.ones(len(snap.ids), dtype=np.int32)
+        for session, run_start, run_end in snapshot_runs(snap):
+            part = store._partition(session)
+            for start in range(run_start, run_end, _LOAD_BLOCK):
+                end = min(run_end, start + _LOAD_BLOCK)
+                lo, hi = int(indptr[start]), int(indptr[end])
+                rows = np.repeat(np.arange(end - start), np.diff(indptr[start : end + 1]))
+                out = np.zeros((end - start, store.dim), dtype=np.float32)
+                np.add.at(out, (rows, cols[indices[lo:hi]]), signs[indices[lo:hi]] * data[lo:hi])
+                block_vids = list(snap.ids.rows(start, end))
+                block_texts = list(snap.texts.rows(start, end))
+                part.extend(block_vids, block_texts, list(snap.metas.rows(start, end)), list(snap.hashes.rows(start, end)), list(range(start, end)), _unit_rows(out))
+                part.refs[len(part.ids) - (end - start) :] = refs[start:end].tolist()
+                store._admit(part, block_vids, block_texts)
+        store._seq = len(snap.ids)
+        store.evict()
+        return store
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
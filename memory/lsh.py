@@ -0,0 +1,56 @@
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+# MinHash functions are (a * x + b) mod _PRIME over 32-bit term ids; a * x stays below 2**63
+_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """Banded MinHash index over sets of term ids.
+
+    Each item gets `bands * rows` MinHash values; band `i` (one hash table)
+    keys the item by its `rows` values for that band. A query's candidates
+    are the items sharing at least one band key with it, which for Jaccard
+    similarity `s` happens with probability `1 - (1 - s**rows) ** bands`:
+    more bands raise recall, more rows per band cut false candidates.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 4, seed: int = 0):
+        if bands <= 0 or rows <= 0:
+            raise ValueError("bands and rows must be positive")
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, bands * rows, dtype=np.int64)[:, None]
+        self._b = rng.integers(0, _PRIME, bands * rows, dtype=np.int64)[:, None]
+        self.tables: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def signature(self, term_ids: Iterable[int]) -> np.ndarray:
+        ids = np.fromiter(term_ids, dtype=np.int64)
+        if not len(ids):
+            return np.full(self.bands * self.rows, _PRIME, dtype=np.int64)
+        return ((self._a * ids + self._b) % _PRIME).min(axis=1)
+
+    def _keys(self, term_ids: Iterable[int]) -> List[bytes]:
+        return [band.tobytes() for band in self.signature(term_ids).reshape(self.bands, self.rows)]
+
+    def add(self, item: int, term_ids: Iterable[int]) -> None:
+        for table, key in zip(self.tables, self._keys(term_ids)):
+            table.setdefault(key, []).append(item)
+
+    def remove(self, item: int, term_ids: Iterable[int]) -> None:
+        """Unindex `item`; `term_ids` must be the set it was added with."""
+        for table, key in zip(self.tables, self._keys(term_ids)):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            bucket.remove(item)
+            if not bucket:
+                del table[key]
+
+    def candidates(self, term_ids: Iterable[int]) -> Set[int]:
+        found: Set[int] = set()
+        for table, key in zip(self.tables, self._keys(term_ids)):
+            found.update(table.get(key, ()))
+        return found
@@ -1,25 +1,40 @@
-import os
-from typing import List
+from typing import List, Optional, Union
+
+from memory.note_log import TextNoteStore
+from memory.query_cache import QueryCache
+from memory.sqlite_notes import SQLiteNoteStore
+
+NoteStore = Union[TextNoteStore, SQLiteNoteStore]
 
 
 class MemoryManager:
-    """Lightweight episodic memory backed by plain text files."""
+    """Lightweight episodic memory over a note store (text logs unless one is given).
 
-    def __init__(self, memory_dir: str = "memory/store"):
+    Give it the tools' search `cache` when they share the store, so its
+    writes invalidate cached searches of the session like theirs do.
+    """
+
+    def __init__(self, memory_dir: str = "memory/store", store: Optional[NoteStore] = None, cache: Optional[QueryCache] = None):
         self.memory_dir = memory_dir
-        os.makedirs(memory_dir, exist_ok=True)
+        self.store = store if store is not None else TextNoteStore(memory_dir)
+        self.cache = cache
 
     def append(self, note: str, session: str = "default") -> str:
-        path = os.path.join(self.memory_dir, f"{session}.notes.txt")
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(note.strip() + "\n")
-        return path
+        if self.cache is not None:
+            self.cache.bump(session)
+        return self.store.append([note], session=session)
 
     def search(self, query: str, session: str = "default", top_k: int = 3) -> List[str]:
-        path = os.path.join(self.memory_dir, f"{session}.notes.txt")
-        if not os.path.exists(path):
-            return []
-        with open(path, "r", encoding="utf-8") as f:
-            lines = [ln.strip() for ln in f if ln.strip()]
-        matches = [ln for ln in lines if query.lower() in ln.lower()]
-        return matches[:top_k]
+        return self.store.search(query, session=session, top_k=top_k)
+
+    def flush(self) -> None:
+        self.store.flush()
+
+    def close(self) -> None:
+        self.store.close()
+
+    def __enter__(self) -> "MemoryManager":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
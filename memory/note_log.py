@@ -0,0 +1,609 @@
+import atexit
+import gzip
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from memory.vector_store import content_hash
+
+DEFAULT_SEGMENT_BYTES = 1 << 20
+DEFAULT_FLUSH_BYTES = 64 << 10
+DEFAULT_FLUSH_SECONDS = 1.0
+_TOKEN_RE = re.compile(r"\w+")
+_OFFSETS_SUFFIX = ".idx"
+_TOKENS_SUFFIX = ".tokens.json"
+_COMPACT_SUFFIX = ".compact"
+
+
+def line_tokens(text: str) -> set:
+    """Distinct lower-cased word tokens of a line."""
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+def note_lines(note: str) -> List[str]:
+    """Physical lines a note is stored as (blank lines are dropped)."""
+    text = note.replace("\r\n", "\n").replace("\r", "\n")
+    return [ln.strip() for ln in text.split("\n") if ln.strip()]
+
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class _Segment:
+    """One log file, the byte offset of each of its lines and its token postings.
+
+    Offsets are persisted in an append-only `.idx` sidecar (8 bytes per line).
+    Token postings map a lower-cased token to the line numbers containing it;
+    they are built on first search and saved to `.tokens.json` once the
+    segment is sealed, so reopening only re-tokenizes the active segment.
+    Both files are written through handles kept open until `close()`.
+
+    Compaction may replace a sealed segment with a gzipped `<path>.gz`;
+    sidecars stay keyed by the uncompressed name and offsets then refer to
+    the decompressed stream.
+    """
+
+    def __init__(self, path: str, number: int = 0):
+        self.path = path
+        self.number = number
+        self.offsets = array("Q")
+        self.end = 0  # bytes of the file covered by `offsets`
+        self.postings: Optional[Dict[str, array]] = None
+        self._data_file = None
+        self._offsets_file = None
+        self._ident: Optional[Tuple[int, int]] = None
+        self._load_offsets()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def file(self) -> Optional[str]:
+        """Path of the data file on disk (plain or gzipped), or None."""
+        for path in (self.path, self.path + ".gz"):
+            if os.path.exists(path):
+                return path
+        return None
+
+    @property
+    def compressed(self) -> bool:
+        return not os.path.exists(self.path) and os.path.exists(self.path + ".gz")
+
+    def open(self):
+        path = self.file()
+        return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+    def mtime(self) -> float:
+        return os.path.getmtime(self.file())
+
+    def _load_offsets(self) -> None:
+        self.close()
+        self.offsets = array("Q")
+        self.end = 0
+        self.postings = None
+        self._ident = None
+        idx_path = self.path + _OFFSETS_SUFFIX
+        path = self.file()
+        if path is None:
+            _remove(idx_path)
+            _remove(self.path + _TOKENS_SUFFIX)
+            return
+        st = os.stat(path)
+        self._ident = (st.st_dev, st.st_ino)
+        if os.path.exists(idx_path):
+            with open(idx_path, "rb") as f:
+                raw = f.read()
+            self.offsets.frombytes(raw[: len(raw) - len(raw) % self.offsets.itemsize])
+        if self.offsets:
+            with self.open() as f:
+                f.seek(self.offsets[-1])
+                last = f.readline()
+            if last.endswith(b"\n"):
+                self.end = self.offsets[-1] + len(last)
+            else:
+                # the sidecar points past the file (rewritten or truncated): start over
+                self.offsets = array("Q")
+                _remove(self.path + _TOKENS_SUFFIX)
+        with open(idx_path, "wb") as f:
+            self.offsets.tofile(f)
+        if self.compressed and not self.offsets:
+            with self.open() as f:
+                self._index(f.read())
+            self._offsets_file.flush()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Index lines appended by other writers; reload if the file was replaced, shrank or vanished."""
+        path = self.file()
+        if path is None:
+            if self._ident is not None:
+                self._load_offsets()
+            return
+        st = os.stat(path)
+        if (st.st_dev, st.st_ino) != self._ident:
+            self._load_offsets()
+        elif path.endswith(".gz"):
+            return  # compacted segments never change in place
+        elif st.st_size < self.end:
+            self._load_offsets()
+        elif st.st_size > self.end:
+            with open(self.path, "rb") as f:
+                f.seek(self.end)
+                tail = f.read()
+            # a trailing partial line is picked up once its newline lands
+            self._index(tail[: tail.rfind(b"\n") + 1])
+            self._offsets_file.flush()
+
+    def _index(self, data: bytes) -> None:
+        new = array("Q")
+        pos = self.end
+        for raw in data.splitlines(keepends=True):
+            new.append(pos)
+            pos += len(raw)
+        if self._offsets_file is None:
+            self._offsets_file = open(self.path + _OFFSETS_SUFFIX, "ab")
+        new.tofile(self._offsets_file)
+        first = len(self.offsets)
+        self.offsets.extend(new)
+        self.end = pos
+        if self.postings is not None:
+            self._tokenize(first, data)
+
+    def _tokenize(self, first: int, data: bytes) -> None:
+        for i, raw in enumerate(data.splitlines(), start=first):
+            for token in line_tokens(raw.decode("utf-8")):
+                lines = self.postings.get(token)
+                if lines is None:
+                    lines = self.postings[token] = array("I")
+                lines.append(i)
+
+    def append(self, lines: Sequence[str], fsync: bool = False) -> None:
+        self.refresh()
+        data = "".join(ln + "\n" for ln in lines).encode("utf-8")
+        if self._data_file is None:
+            self._data_file = open(self.path, "ab")
+            st = os.fstat(self._data_file.fileno())
+            self._ident = (st.st_dev, st.st_ino)
+        self._data_file.write(data)
+        self._index(data)
+        for f in (self._data_file, self._offsets_file):
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def close(self) -> None:
+        for f in (self._data_file, self._offsets_file):
+            if f is not None:
+                f.close()
+        self._data_file = self._offsets_file = None
+
+    def token_postings(self, sealed: bool) -> Dict[str, array]:
+        if self.postings is not None:
+            return self.postings
+        self.postings = {}
+        covered = 0
+        tokens_path = self.path + _TOKENS_SUFFIX
+        if os.path.exists(tokens_path):
+            with open(tokens_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["lines"] <= len(self.offsets):
+                covered = saved["lines"]
+                self.postings = {t: array("I", lines) for t, lines in saved["postings"].items()}
+        if covered < len(self.offsets):
+            with self.open() as f:
+                f.seek(self.offsets[covered])
+                self._tokenize(covered, f.read(self.end - self.offsets[covered]))
+            if sealed:
+                self.save_postings()
+        return self.postings
+
+    def save_postings(self) -> None:
+        payload = {"lines": len(self.offsets), "postings": {t: lines.tolist() for t, lines in self.postings.items()}}
+        with open(self.path + _TOKENS_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+
+    def read(self, f, i: int) -> str:
+        start = self.offsets[i]
+        stop = self.offsets[i + 1] if i + 1 < len(self.offsets) else self.end
+        f.seek(start)
+        return f.read(stop - start).decode("utf-8").strip()
+
+    def read_all(self) -> List[bytes]:
+        """Every indexed line, newline included."""
+        if not len(self):
+            return []
+        with self.open() as f:
+            f.seek(self.offsets[0])
+            return f.read(self.end - self.offsets[0]).splitlines(keepends=True)
+
+    def remove(self) -> None:
+        self.close()
+        for path in (self.path, self.path + ".gz", self.path + _OFFSETS_SUFFIX, self.path + _TOKENS_SUFFIX):
+            _remove(path)
+
+
+def _candidates(postings: Dict[str, array], query: str) -> Optional[List[int]]:
+    """Line numbers that may contain `query` (already lower-cased); None means scan them all.
+
+    A query token with non-word characters on both sides must be a whole
+    token of the line; one touching an end of the query may be cut off, so
+    it is matched against the vocabulary as a suffix, prefix or substring.
+    """
+    spans = [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(query)]
+    if not spans:
+        return None
+    inner = sorted((postings.get(t, ()) for t, start, end in spans if start > 0 and end < len(query)), key=len)
+    if inner:
+        found = set(inner[0])
+        for lines in inner[1:]:
+            found.intersection_update(lines)
+        return sorted(found)
+    token, start, end = max(spans, key=lambda span: len(span[0]))
+    if start == 0 and end == len(query):
+        matches = [v for v in postings if token in v]
+    elif start == 0:
+        matches = [v for v in postings if v.endswith(token)]
+    else:
+        matches = [v for v in postings if v.startswith(token)]
+    found = set()
+    for v in matches:
+        found.update(postings[v])
+    return sorted(found)
+
+
+class NoteLog:
+    """Append-only notes for one session, split into segment files.
+
+    Segment 0 keeps the original `<session>.notes.txt` name so existing
+    notes stay readable; once the active segment reaches `segment_bytes`
+    appends roll over to `<session>.notes.<n>.txt`. Searches keep the
+    case-insensitive substring semantics of the flat file but only seek to
+    lines the token index says can match.
+
+    Appends are buffered and written in one batch once `flush_bytes` of
+    notes are pending or the oldest pending note is `flush_seconds` old (a
+    daemon timer armed by the first buffered note writes them then, even if
+    no further append comes); reads, `flush()`, `close()` and leaving a
+    `with` block write them out too. With `fsync=True` every batch is
+    fsynced, so durability costs one sync per batch rather than per note.
+
+    `compact()` rewrites the sealed segments (all but the active one) and
+    holds the log's lock only to swap files in, so appends keep flowing to
+    the active segment while it runs.
+    """
+
+    def __init__(
+        self,
+        memory_dir: str,
+        session: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        fsync: bool = False,
+    ):
+        self.memory_dir = memory_dir
+        self.session = session
+        self.segment_bytes = segment_bytes
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._pending_since = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        os.makedirs(memory_dir, exist_ok=True)
+        pattern = re.compile(rf"{re.escape(session)}\.notes\.(\d+)\.txt(?:\.gz)?")
+        numbers = sorted({int(m.group(1)) for m in map(pattern.fullmatch, os.listdir(memory_dir)) if m} - {0})
+        self.segments = [_Segment(self.segment_path(n), n) for n in [0] + numbers]
+
+    def segment_path(self, n: int) -> str:
+        name = f"{self.session}.notes.txt" if n == 0 else f"{self.session}.notes.{n}.txt"
+        return os.path.join(self.memory_dir, name)
+
+    @property
+    def path(self) -> str:
+        """File the next append goes to."""
+        return self.segments[-1].path
+
+    def exists(self) -> bool:
+        return bool(self._pending) or any(seg.file() is not None for seg in self.segments)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.flush()
+            for seg in self.segments:
+                seg.refresh()
+            return sum(len(seg) for seg in self.segments)
+
+    def append(self, notes: Sequence[str]) -> str:
+        """Buffer notes for the next batch write; returns the segment they are headed for."""
+        lines = [ln for note in notes for ln in note_lines(note)]
+        if not lines:
+            return self.path
+        with self._lock:
+            first = not self._pending
+            if first:
+                self._pending_since = time.monotonic()
+            self._pending.extend(lines)
+            self._pending_bytes += sum(len(ln) + 1 for ln in lines)
+            if self._pending_bytes >= self.flush_bytes or time.monotonic() - self._pending_since >= self.flush_seconds:
+                self.flush()
+            elif first and self._timer is None and math.isfinite(self.flush_seconds):
+                self._timer = threading.Timer(self.flush_seconds, self._flush_due)
+                self._timer.daemon = True
+                self._timer.start()
+            return self.path
+
+    def _flush_due(self) -> None:
+        # timer thread: the oldest pending note has waited `flush_seconds`
+        try:
+            self.flush()
+        except OSError as e:
+            # the notes stay pending; the next append or flush retries them
+            print(f"could not flush notes to {self.path}: {e}", file=sys.stderr)
+
+    def flush(self) -> None:
+        """Write pending notes to the active segment, rolling over to a new one if it is full."""
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return
+            active = self.segments[-1]
+            active.refresh()
+            if active.end >= self.segment_bytes or active.compressed:
+                active = self._roll()
+            active.append(self._pending, fsync=self.fsync)
+            self._pending = []
+            self._pending_bytes = 0
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _roll(self) -> _Segment:
+        """Seal the active segment and start the next one."""
+        sealed = self.segments[-1]
+        if sealed.postings is not None:
+            sealed.save_postings()
+        sealed.close()
+        active = _Segment(self.segment_path(sealed.number + 1), sealed.number + 1)
+        self.segments.append(active)
+        return active
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            for seg in self.segments:
+                seg.close()
+
+    def __enter__(self) -> "NoteLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            self.flush()
+            for seg in self.segments:
+                seg.refresh()
+            blocks = [seg.read_all() for seg in self.segments]
+        for block in blocks:
+            for raw in block:
+                yield raw.decode("utf-8").strip()
+
+    def search(self, query: str, top_k: int = 3) -> List[str]:
+        """First `top_k` lines containing `query`, ignoring case, in append order."""
+        q = query.lower()
+        hits: List[str] = []
+        with self._lock:
+            self.flush()
+            for n, seg in enumerate(self.segments):
+                seg.refresh()
+                if not len(seg):
+                    continue
+                candidates = _candidates(seg.token_postings(sealed=n < len(self.segments) - 1), q)
+                with seg.open() as f:
+                    for i in range(len(seg)) if candidates is None else candidates:
+                        line = seg.read(f, i)
+                        if q in line.lower():
+                            hits.append(line)
+                            if len(hits) >= top_k:
+                                return hits
+        return hits
+
+    def compact(
+        self,
+        retention_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        compress: bool = False,
+        seal: bool = False,
+    ) -> Dict[str, int]:
+        """Rewrite the sealed segments without duplicates, expired or over-cap lines.
+
+        Retention is per segment: a segment last written more than
+        `retention_seconds` ago is dropped whole. Of the remaining lines the
+        newest copy of each note is kept, and the newest lines up to
+        `max_bytes` in total. The survivors are repacked, in order, into
+        the same segment numbers (never more segments than before), gzipped
+        if `compress` is set. `seal=True` first rolls the active segment so
+        its lines are compacted too; only use it when no other process
+        appends to this session.
+        """
+        with self._lock:
+            self.flush()
+            if seal and len(self.segments[-1]):
+                self._roll()
+            sealed = self.segments[:-1]
+            for seg in sealed:
+                seg.refresh()
+        stats = {"segments_in": len(sealed), "lines_in": sum(len(seg) for seg in sealed), "expired": 0, "duplicates": 0, "over_cap": 0}
+        cutoff = time.time() - retention_seconds if retention_seconds is not None else None
+        # walk newest to oldest so duplicates and the size cap keep the most recent lines
+        kept: List[Tuple[bytes, float]] = []
+        seen = set()
+        total = 0
+        for seg in reversed(sealed):
+            if not len(seg):
+                continue
+            mtime = seg.mtime()
+            if cutoff is not None and mtime < cutoff:
+                stats["expired"] += len(seg)
+                continue
+            for raw in reversed(seg.read_all()):
+                key = content_hash(raw.decode("utf-8"))
+                if key in seen:
+                    stats["duplicates"] += 1
+                elif max_bytes is not None and total + len(raw) > max_bytes:
+                    stats["over_cap"] += 1
+                    total = max_bytes
+                else:
+                    seen.add(key)
+                    kept.append((raw, mtime))
+                    total += len(raw)
+        kept.reverse()
+        kept_bytes = sum(len(raw) for raw, _ in kept)
+        # close a group once it reaches the target, so there are at most len(sealed) groups
+        target = max(self.segment_bytes, -(-kept_bytes // max(len(sealed), 1)))
+        groups: List[List[Tuple[bytes, float]]] = []
+        size = target
+        for entry in kept:
+            if size >= target:
+                groups.append([])
+                size = 0
+            groups[-1].append(entry)
+            size += len(entry[0])
+        written = [self._write_compacted(seg, group, compress) for seg, group in zip(sealed, groups)]
+        with self._lock:
+            for i, seg in enumerate(sealed):
+                seg.close()
+                _remove(seg.path + _TOKENS_SUFFIX)
+                if i < len(written):
+                    data_tmp, idx_tmp, mtime = written[i]
+                    final = seg.path + ".gz" if compress else seg.path
+                    os.replace(idx_tmp, seg.path + _OFFSETS_SUFFIX)
+                    os.replace(data_tmp, final)
+                    _remove(seg.path if compress else seg.path + ".gz")
+                    # keep the lines' age, so retention is not reset by compaction
+                    os.utime(final, (mtime, mtime))
+                else:
+                    seg.remove()
+                seg.refresh()
+            self.segments = sealed[: len(written)] + self.segments[len(sealed) :]
+            if self.segments[0].number != 0:
+                self.segments.insert(0, _Segment(self.segment_path(0), 0))
+        stats.update(segments_out=len(written), lines_out=len(kept), bytes_out=kept_bytes)
+        return stats
+
+    def _write_compacted(self, seg: _Segment, group: List[Tuple[bytes, float]], compress: bool) -> Tuple[str, str, float]:
+        data_tmp = seg.path + _COMPACT_SUFFIX
+        offsets = array("Q")
+        pos = 0
+        for raw, _ in group:
+            offsets.append(pos)
+            pos += len(raw)
+        with (gzip.open if compress else open)(data_tmp, "wb") as f:
+            f.write(b"".join(raw for raw, _ in group))
+        with open(data_tmp + _OFFSETS_SUFFIX, "wb") as f:
+            offsets.tofile(f)
+        return data_tmp, data_tmp + _OFFSETS_SUFFIX, max(mtime for _, mtime in group)
+
+    def clear(self) -> None:
+        """Delete every segment and sidecar of this session, including pending notes."""
+        with self._lock:
+            self._cancel_timer()
+            self._pending = []
+            self._pending_bytes = 0
+            for seg in self.segments:
+                seg.remove()
+            self.segments = [_Segment(self.segment_path(0), 0)]
+
+
+_LOGS: Dict[str, NoteLog] = {}
+
+
+def session_log(memory_dir: str, session: str, **options) -> NoteLog:
+    """Shared log for a session, so every writer in the process sees the same offsets.
+
+    `options` (NoteLog keyword arguments) only apply when the log is first opened.
+    """
+    key = os.path.join(os.path.abspath(memory_dir), session)
+    log = _LOGS.get(key)
+    if log is None:
+        log = _LOGS[key] = NoteLog(memory_dir, session, **options)
+    return log
+
+
+@atexit.register
+def _close_logs() -> None:
+    # notes still buffered when the interpreter exits
+    for log in _LOGS.values():
+        try:
+            log.close()
+        except Exception as e:  # noqa: BLE001 - one unwritable log must not keep the others from flushing
+            print(f"could not flush notes to {log.path}: {e}", file=sys.stderr)
+
+
+class TextNoteStore:
+    """Note storage as one segmented text log per session under `memory_dir`.
+
+    `log_options` (buffering thresholds, fsync) are passed to each session's NoteLog.
+    """
+
+    def __init__(self, memory_dir: str, **log_options):
+        self.memory_dir = memory_dir
+        self.log_options = log_options
+        os.makedirs(memory_dir, exist_ok=True)
+        self._logs: Dict[str, NoteLog] = {}
+
+    def log(self, session: str) -> NoteLog:
+        log = self._logs.get(session)
+        if log is None:
+            log = self._logs[session] = session_log(self.memory_dir, session, **self.log_options)
+        return log
+
+    def location(self, session: str) -> str:
+        return self.log(session).path
+
+    def append(self, notes: Sequence[str], session: str = "default") -> str:
+        return self.log(session).append(notes)
+
+    def search(self, query: str, session: str = "default", top_k: int = 3) -> List[str]:
+        return self.log(session).search(query, top_k=top_k)
+
+    def notes(self, session: str = "default") -> Iterator[str]:
+        return iter(self.log(session))
+
+    def has_session(self, session: str) -> bool:
+        return self.log(session).exists()
+
+    def sessions(self) -> List[str]:
+        pattern = re.compile(r"(.+?)\.notes(?:\.\d+)?\.txt(?:\.gz)?")
+        return sorted({m.group(1) for m in map(pattern.fullmatch, os.listdir(self.memory_dir)) if m})
+
+    def compact(self, session: str, **options) -> Dict[str, int]:
+        """Compact one session's log; `options` go to `NoteLog.compact`."""
+        return self.log(session).compact(**options)
+
+    def flush(self) -> None:
+        for log in self._logs.values():
+            log.flush()
+
+    def close(self) -> None:
+        for log in self._logs.values():
+            log.close()
+
+    def __enter__(self) -> "TextNoteStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
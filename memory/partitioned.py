@@ -0,0 +1,288 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from memory.doc_buffer import Text, resolve_text
+from memory.eviction import CapacityPolicy
+from memory.snapshot import KeyIndex, MetaColumn, Snapshot, StrColumn, TextColumn
+from memory.vector_store import DEFAULT_SESSION, content_hash, make_vid, session_of
+
+
+class RowPartition:
+    """Per-row records of one session, for stores that keep vectors as array rows.
+
+    Subclasses own the vector arrays (and grow `alive` with them); this
+    class keeps ids, texts, metadata, content hashes, refcounts and
+    insertion sequence numbers. Removed rows are tombstoned in `alive` and
+    dropped by `compact` once they make up half of the partition.
+    """
+
+    def __init__(self, capacity: int = 64):
+        # lists, or lazy columns over a snapshot until the next `compact`
+        self.ids: List[str] | StrColumn = []
+        self.texts: List[Text] | TextColumn = []
+        self.metas: List[Dict] | MetaColumn = []
+        self.hashes: List[str] | StrColumn = []
+        self.refs: List[int] = []
+        self.seqs: List[int] = []
+        self.rows: Dict[str, int] | KeyIndex = {}
+        self.by_hash: Dict[str, int] | KeyIndex = {}
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.dead = 0
+        self.bytes = 0
+        self.sizes: Dict[str, int] = {}  # approximate bytes per id, only when the store is bounded
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.dead
+
+    @property
+    def n_rows(self) -> int:
+        """Rows in the arrays, including tombstoned ones."""
+        return len(self.ids)
+
+    def _extend_records(self, vids: List[str], texts: List[Text], metas: List[Dict], digests: List[str], seqs: List[int]) -> None:
+        # called by subclasses once their arrays (and `alive`) have room for the rows
+        row = len(self.ids)
+        self.alive[row : row + len(vids)] = True
+        for i, vid in enumerate(vids):
+            self.rows[vid] = row + i
+            self.by_hash.setdefault(digests[i], row + i)
+        self.ids.extend(vids)
+        for text in texts:
+            self.texts.append(text)
+        self.metas.extend(metas)
+        self.hashes.extend(digests)
+        self.refs.extend([1] * len(vids))
+        self.seqs.extend(seqs)
+
+    def map_records(self, snap: Snapshot, start: int, end: int) -> None:
+        """Take the records of snapshot rows `start:end`, one session run, without decoding them."""
+        self.ids = snap.ids.rows(start, end)
+        self.texts = snap.texts.rows(start, end)
+        self.metas = snap.metas.rows(start, end)
+        self.hashes = snap.hashes.rows(start, end)
+        self.refs = snap.refs[start:end].tolist() if snap.refs is not None else [1] * (end - start)
+        self.seqs = list(range(start, end))
+        self.rows = snap.id_index(start, end)
+        self.by_hash = snap.hash_index(start, end)
+        self.alive = np.ones(end - start, dtype=bool)
+
+    def remove(self, vid: str) -> None:
+        """Tombstone one row and take it out of the lookups."""
+        row = self.rows.pop(vid)
+        self.alive[row] = False
+        self.dead += 1
+        if self.by_hash.get(self.hashes[row]) == row:
+            del self.by_hash[self.hashes[row]]
+        self.bytes -= self.sizes.pop(vid, 0)
+        self._forget_row(row)
+        if self.dead * 2 > len(self.ids):
+            self.compact()
+
+    def _forget_row(self, row: int) -> None:
+        """Subclass hook: drop a removed row from derived statistics."""
+
+    def compact(self) -> None:
+        """Rewrite the arrays and records without tombstoned rows."""
+        if not self.dead:
+            return
+        keep = np.flatnonzero(self.alive[: len(self.ids)])
+        self._compact_arrays(keep)
+        self.alive = np.ones(len(keep), dtype=bool)
+        rows = keep.tolist()
+        self.ids = [self.ids[r] for r in rows]
+        self.texts = [self.texts[r] for r in rows]
+        self.metas = [self.metas[r] for r in rows]
+        self.hashes = [self.hashes[r] for r in rows]
+        self.refs = [self.refs[r] for r in rows]
+        self.seqs = [self.seqs[r] for r in rows]
+        self.rows = {vid: i for i, vid in enumerate(self.ids)}
+        self.by_hash = {}
+        for i, digest in enumerate(self.hashes):
+            self.by_hash.setdefault(digest, i)
+        self.dead = 0
+
+    def _compact_arrays(self, keep: np.ndarray) -> None:
+        """Subclass hook: keep only rows `keep` of the vector arrays."""
+        raise NotImplementedError
+
+
+class PartitionedStore:
+    """Session partitions, deduplication and capacity bookkeeping shared by the array-backed stores.
+
+    Subclasses provide `_new_partition`, `_insert` (vectorize new rows into
+    a partition), `_item_bytes` and their own search and snapshot layout.
+    """
+
+    def __init__(
+        self,
+        max_items: int | None = None,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+        eviction: str = "lru",
+    ):
+        self.partitions: Dict[str, RowPartition] = {}
+        self._seq = 0
+        self.dedup_stats = {"vectors_saved": 0, "bytes_saved": 0}
+        self.capacity = CapacityPolicy(max_items=max_items, max_bytes=max_bytes, ttl_seconds=ttl_seconds, policy=eviction)
+
+    @property
+    def eviction_stats(self) -> Dict[str, int]:
+        return self.capacity.stats
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.partitions.values())
+
+    def partition_size(self, session: str) -> int:
+        part = self.partitions.get(session)
+        return len(part) if part else 0
+
+    def drop_session(self, session: str) -> int:
+        """Forget a whole session partition in O(1); returns how many items it held."""
+        part = self.partitions.pop(session, None)
+        if part is None:
+            return 0
+        if self.capacity.enabled:
+            self.capacity.release(len(part), part.bytes)
+        return len(part)
+
+    def evict(self) -> int:
+        """Expire items past their TTL and evict until within capacity; returns how many were removed."""
+        if not self.capacity.enabled:
+            return 0
+        removed = 0
+        for vid, _ in self.capacity.victims(self._exists):
+            self.partitions[session_of(vid)].remove(vid)
+            removed += 1
+        return removed
+
+    def _exists(self, vid: str) -> bool:
+        part = self.partitions.get(session_of(vid))
+        return part is not None and vid in part.rows
+
+    def _partition(self, session: str) -> RowPartition:
+        part = self.partitions.get(session)
+        if part is None:
+            part = self.partitions[session] = self._new_partition()
+        return part
+
+    def _new_partition(self) -> RowPartition:
+        raise NotImplementedError
+
+    def add(self, text: Text, metadata: Dict | None = None, session: str | None = None) -> str:
+        return self.add_many([text], metadata=metadata, session=session)[0]
+
+    def add_many(self, texts: List[Text], metadata: Dict | None = None, session: str | None = None) -> List[str]:
+        """Index a batch of texts into one session; returns one id per input text.
+
+        Repeats (within the batch or already stored) return the existing id
+        and bump its refcount. A `DocSpan` is stored as the span and read
+        back through its document buffer.
+        """
+        metadata = metadata or {}
+        session = session or metadata.get("session", DEFAULT_SESSION)
+        part = self._partition(session)
+        prefix = make_vid(session)
+        vids: List[str] = []
+        batch: Dict[str, str] = {}
+        repeats_in_batch: List[str] = []
+        new_vids, sources, new_texts, digests, seqs = [], [], [], [], []
+        for i, source in enumerate(texts):
+            text = resolve_text(source)
+            digest = content_hash(text)
+            row = part.by_hash.get(digest)
+            existing = part.ids[row] if row is not None else batch.get(digest)
+            if existing is not None:
+                self.capacity.touch(existing)
+                if row is not None:
+                    part.refs[row] += 1
+                else:
+                    repeats_in_batch.append(existing)
+                self.dedup_stats["vectors_saved"] += 1
+                self.dedup_stats["bytes_saved"] += len(text.encode("utf-8"))
+                vids.append(existing)
+                continue
+            vid = batch[digest] = f"{prefix}-{i}"
+            new_vids.append(vid)
+            sources.append(source)
+            new_texts.append(text)
+            digests.append(digest)
+            seqs.append(self._seq)
+            self._seq += 1
+            vids.append(vid)
+        if new_vids:
+            metas = [dict(metadata) for _ in new_vids]
+            self._insert(part, new_vids, sources, new_texts, metas, digests, seqs)
+            self._admit(part, new_vids, sources)
+        for vid in repeats_in_batch:
+            part.refs[part.rows[vid]] += 1
+        self.evict()
+        return vids
+
+    def _insert(
+        self,
+        part: RowPartition,
+        vids: List[str],
+        sources: List[Text],
+        texts: List[str],
+        metas: List[Dict],
+        digests: List[str],
+        seqs: List[int],
+    ) -> None:
+        """Vectorize resolved `texts` and append them to `part`, storing `sources`."""
+        raise NotImplementedError
+
+    def _item_bytes(self, part: RowPartition, row: int, text: Text) -> int:
+        raise NotImplementedError
+
+    def _admit(self, part: RowPartition, vids: List[str], texts: List[Text]) -> None:
+        if not self.capacity.enabled:
+            return
+        for vid, text in zip(vids, texts):
+            nbytes = part.sizes[vid] = self._item_bytes(part, part.rows[vid], text)
+            part.bytes += nbytes
+            self.capacity.admit(vid, nbytes)
+
+    def search(self, query: str, top_k: int = 3, session: str | None = None) -> List[Tuple[str, float]]:
+        """Top-k items by the store's scoring, within `session` if given, else across all sessions."""
+        return self.search_many([query], top_k=top_k, session=session)[0]
+
+    def _search_partitions(self, session: str | None) -> List[RowPartition]:
+        """Non-empty partitions a search covers, after expiring items past their TTL."""
+        if self.capacity.ttl_seconds is not None:
+            self.evict()
+        if session is not None:
+            return [self.partitions[session]] if self.partition_size(session) else []
+        return [p for p in self.partitions.values() if len(p)]
+
+    def _rank(self, hits: List[List[Tuple[float, int, str]]], top_k: int) -> List[List[Tuple[str, float]]]:
+        """Merge per-partition (score, seq, id) hits into each query's top-k."""
+        results = []
+        for query_hits in hits:
+            # highest score first, ties in insertion order like VectorStore
+            query_hits.sort(key=lambda h: (-h[0], h[1]))
+            results.append([(vid, score) for score, _, vid in query_hits[:top_k]])
+        if self.capacity.enabled:
+            for top in results:
+                for vid, _ in top:
+                    self.capacity.touch(vid)
+        return results
+
+    def get_text(self, vid: str) -> str:
+        part = self.partitions.get(session_of(vid))
+        if part is None:
+            return ""
+        row = part.rows.get(vid)
+        return resolve_text(part.texts[row]) if row is not None else ""
+
+    def _snapshot_records(self) -> Dict:
+        """`write_snapshot` arguments for the per-row records, partition by partition."""
+        parts = list(self.partitions.values())
+        return {
+            "sessions": [(session, len(p.ids)) for session, p in self.partitions.items()],
+            "ids": [vid for p in parts for vid in p.ids],
+            "metas": [m for p in parts for m in p.metas],
+            "texts": (resolve_text(t) for p in parts for t in p.texts),
+            "hashes": [h for p in parts for h in p.hashes],
+            "refs": [r for p in parts for r in p.refs],
+        }
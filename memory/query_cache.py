@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class QueryCache:
+    """Bounded LRU cache for memory search results.
+
+    Keys carry the session's generation counter; writers call `bump(session)`
+    on every append, so results cached before the write are never returned
+    again and simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bump(self, session: str) -> None:
+        self._generations[session] = self._generations.get(session, 0) + 1
+
+    def _key(self, session: str, key: Hashable) -> Tuple:
+        return (session, self._generations.get(session, 0), key)
+
+    def get(self, session: str, key: Hashable) -> Optional[Any]:
+        full_key = self._key(session, key)
+        if full_key in self._entries:
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return self._entries[full_key]
+        self.misses += 1
+        return None
+
+    def put(self, session: str, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        full_key = self._key(session, key)
+        self._entries[full_key] = value
+        self._entries.move_to_end(full_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,334 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+SNAPSHOT_VERSION = 2
+# version 1 kept ids, hashes and metadata in line-per-row text sidecars
+_READABLE_VERSIONS = (1, 2)
+_ARRAYS = ("indptr", "indices", "data", "norms", "text_offsets", "text_blob")
+
+
+class _Column:
+    """List-like column: snapshot rows are decoded on access, rows appended afterwards live in a plain list."""
+
+    def __init__(self, base: int):
+        self._base = base
+        self._extra: List = []
+
+    def __len__(self) -> int:
+        return self._base + len(self._extra)
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if i < self._base:
+            return self._decode(i)
+        return self._extra[i - self._base]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, value) -> None:
+        self._extra.append(value)
+
+    def extend(self, values: Iterable) -> None:
+        self._extra.extend(values)
+
+    def _decode(self, i: int):
+        raise NotImplementedError
+
+
+class TextColumn(_Column):
+    """Column of strings backed by a UTF-8 blob plus offsets (the blob may be memory-mapped)."""
+
+    def __init__(self, blob: np.ndarray | None = None, offsets: np.ndarray | None = None):
+        self.blob = blob if blob is not None else np.zeros(0, dtype=np.uint8)
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        super().__init__(len(self.offsets) - 1)
+
+    def _decode(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]]).decode("utf-8")
+
+    def rows(self, start: int, end: int) -> "TextColumn":
+        """Column over snapshot rows `start:end`, sharing the blob."""
+        return TextColumn(self.blob, self.offsets[start : end + 1])
+
+
+class StrColumn(_Column):
+    """Column of short strings stored as a fixed-width bytes array (ids, content hashes)."""
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+        super().__init__(len(array))
+
+    @classmethod
+    def of(cls, values: Sequence[str]) -> "StrColumn":
+        return cls(np.array([v.encode("utf-8") for v in values], dtype="S"))
+
+    def _decode(self, i: int) -> str:
+        return self.array[i].decode("utf-8")
+
+    def rows(self, start: int, end: int) -> "StrColumn":
+        return StrColumn(self.array[start:end])
+
+
+class MetaColumn(_Column):
+    """Column of metadata dicts stored once in `table` and referenced per row by `index`.
+
+    Rows with equal metadata share one dict, as they would in the store
+    that was saved.
+    """
+
+    def __init__(self, table: List[Dict], index: np.ndarray):
+        self.table = table
+        self.index = index
+        super().__init__(len(index))
+
+    def _decode(self, i: int) -> Dict:
+        return self.table[self.index[i]]
+
+    def rows(self, start: int, end: int) -> "MetaColumn":
+        return MetaColumn(self.table, self.index[start:end])
+
+
+class KeyIndex:
+    """Dict-like map from the strings of a `StrColumn` array to their row numbers.
+
+    Lookups binary-search the (memory-mapped) array through its sorted
+    permutation `order`, so nothing is built per row; keys set or deleted
+    afterwards are kept in an overlay. A key repeated in the array maps to
+    its first row.
+    """
+
+    def __init__(self, array: np.ndarray, order: np.ndarray | None = None):
+        self.array = array
+        self.order = np.argsort(array, kind="stable") if order is None else np.asarray(order, dtype=np.intp)
+        self._extra: Dict[str, int] = {}
+        self._removed: Set[str] = set()
+
+    def _lookup(self, key: str) -> Optional[int]:
+        needle = key.encode("utf-8")
+        pos = int(np.searchsorted(self.array, needle, sorter=self.order))
+        if pos < len(self.order):
+            row = int(self.order[pos])
+            if self.array[row] == needle:
+                return row
+        return None
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        if key in self._extra:
+            return self._extra[key]
+        if key in self._removed:
+            return default
+        row = self._lookup(key)
+        return default if row is None else row
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> int:
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __setitem__(self, key: str, row: int) -> None:
+        self._extra[key] = row
+
+    def __delitem__(self, key: str) -> None:
+        self.pop(key)
+
+    def pop(self, key: str, *default):
+        row = self.get(key)
+        if row is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self._extra.pop(key, None)
+        self._removed.add(key)
+        return row
+
+    def setdefault(self, key: str, row: int) -> int:
+        existing = self.get(key)
+        if existing is None:
+            self._extra[key] = existing = row
+        return existing
+
+
+@dataclass
+class Snapshot:
+    vocab: List[str]
+    ids: StrColumn
+    metas: MetaColumn
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    norms: np.ndarray
+    texts: TextColumn
+    hashes: Optional[StrColumn] = None
+    refs: Optional[np.ndarray] = None
+    # (session, start, end) runs of rows; None for version 1 snapshots
+    sessions: Optional[List[Tuple[str, int, int]]] = None
+    id_order: Optional[np.ndarray] = None
+    hash_order: Optional[np.ndarray] = None
+
+    def id_index(self, start: int, end: int) -> KeyIndex:
+        """Map the ids of rows `start:end` (one session run) to their position in the run."""
+        return KeyIndex(self.ids.array[start:end], None if self.id_order is None else self.id_order[start:end])
+
+    def hash_index(self, start: int, end: int) -> KeyIndex:
+        """Map the content hashes of rows `start:end` to the first position in the run holding them."""
+        return KeyIndex(self.hashes.array[start:end], None if self.hash_order is None else self.hash_order[start:end])
+
+
+def write_snapshot(
+    path: str,
+    vocab: Sequence[str],
+    ids: Sequence[str],
+    metas: Sequence[Dict],
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    data: np.ndarray,
+    norms: np.ndarray,
+    texts: Iterable[str],
+    sessions: Sequence[Tuple[str, int]],
+    hashes: Sequence[str],
+    refs: Sequence[int],
+) -> str:
+    """Write a store as a directory of .npy arrays plus small JSON/text sidecars.
+
+    `sessions` lists `(session, row count)` for each partition, in row
+    order. Ids and hashes get a sorted permutation per partition so a
+    loader can look rows up without building a dict.
+    """
+    os.makedirs(path, exist_ok=True)
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    # rows of one batch usually share a metadata dict; store each distinct one once
+    table: Dict[str, int] = {}
+    meta_index = [table.setdefault(json.dumps(m), len(table)) for m in metas]
+    id_array = StrColumn.of(ids).array
+    hash_array = StrColumn.of(hashes).array
+    runs, start = [], 0
+    for session, count in sessions:
+        if count:
+            runs.append((session, start, start + count))
+            start += count
+    arrays = {
+        "indptr": np.asarray(indptr, dtype=np.int64),
+        "indices": np.asarray(indices, dtype=np.int32),
+        "data": np.asarray(data, dtype=np.float32),
+        "norms": np.asarray(norms, dtype=np.float64),
+        "text_offsets": offsets,
+        "text_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "ids": id_array,
+        "hashes": hash_array,
+        "refs": np.asarray(refs, dtype=np.int32),
+        "meta_index": np.asarray(meta_index, dtype=np.int32),
+        "id_order": _run_orders(id_array, runs),
+        "hash_order": _run_orders(hash_array, runs),
+    }
+    # write everything to temp names, then swap them in: the store being saved
+    # may itself be memory-mapped from these very files
+    written = []
+    for name, arr in arrays.items():
+        tmp = os.path.join(path, f"{name}.npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        written.append((tmp, f"{name}.npy"))
+    manifest = {"version": SNAPSHOT_VERSION, "rows": len(encoded), "vocab": len(vocab), "sessions": runs}
+    sidecars = {
+        # tokens come from str.split(), so they never contain a newline
+        "vocab.txt": "\n".join(vocab),
+        "metas.json": "[" + ",".join(table) + "]",
+        "manifest.json": json.dumps(manifest),
+    }
+    for name, content in sidecars.items():
+        tmp = os.path.join(path, f"{name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        written.append((tmp, name))
+    for tmp, name in written:
+        os.replace(tmp, os.path.join(path, name))
+    return path
+
+
+def read_snapshot(path: str, mmap: bool = True) -> Snapshot:
+    """Open a snapshot; with `mmap` every per-row array stays on disk until touched.
+
+    Only the manifest, vocabulary and metadata table are parsed, so the
+    cost does not grow with the number of rows. Version 1 snapshots are
+    read too, but their line-per-row sidecars are parsed in full.
+    """
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    version = manifest.get("version")
+    if version not in _READABLE_VERSIONS:
+        raise ValueError(f"Unsupported snapshot version: {version}")
+    mode = "r" if mmap else None
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+
+    arrays = {name: load(name) for name in _ARRAYS}
+    vocab = _read_lines(os.path.join(path, "vocab.txt"))
+    if version == 1:
+        records = _read_v1_records(path, mode)
+    else:
+        with open(os.path.join(path, "metas.json"), "r", encoding="utf-8") as f:
+            table = json.load(f)
+        records = {
+            "ids": StrColumn(load("ids")),
+            "metas": MetaColumn(table, load("meta_index")),
+            "hashes": StrColumn(load("hashes")),
+            "refs": load("refs"),
+            "sessions": [tuple(run) for run in manifest["sessions"]],
+            "id_order": load("id_order"),
+            "hash_order": load("hash_order"),
+        }
+    if len(records["ids"]) != manifest["rows"] or len(records["metas"]) != manifest["rows"] or len(vocab) != manifest["vocab"]:
+        raise ValueError(f"Corrupt snapshot at {path}")
+    return Snapshot(
+        vocab=vocab,
+        indptr=arrays["indptr"],
+        indices=arrays["indices"],
+        data=arrays["data"],
+        norms=arrays["norms"],
+        texts=TextColumn(arrays["text_blob"], arrays["text_offsets"]),
+        **records,
+    )
+
+
+def _read_v1_records(path: str, mode: Optional[str]) -> Dict:
+    ids = _read_lines(os.path.join(path, "ids.txt"))
+    table: Dict[str, int] = {}
+    with open(os.path.join(path, "metas.jsonl"), "r", encoding="utf-8") as f:
+        meta_index = [table.setdefault(ln, len(table)) for ln in f]
+    # content hashes and refcounts are optional; the oldest snapshots lack them
+    hashes_path = os.path.join(path, "hashes.txt")
+    hashes = _read_lines(hashes_path) if os.path.exists(hashes_path) else []
+    refs_path = os.path.join(path, "refs.npy")
+    refs = np.load(refs_path, mmap_mode=mode) if os.path.exists(refs_path) else None
+    return {
+        "ids": StrColumn.of(ids),
+        "metas": MetaColumn([json.loads(ln) for ln in table], np.asarray(meta_index, dtype=np.int32)),
+        "hashes": StrColumn.of(hashes) if len(hashes) == len(ids) else None,
+        "refs": refs if refs is not None and len(refs) == len(ids) else None,
+    }
+
+
+def _run_orders(array: np.ndarray, runs: List[Tuple[str, int, int]]) -> np.ndarray:
+    # positions within each run, sorted by key; stable, so a repeated key finds its first row
+    orders = [np.argsort(array[start:end], kind="stable") for _, start, end in runs]
+    return np.concatenate(orders).astype(np.int64) if orders else np.zeros(0, dtype=np.int64)
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    return content.split("\n") if content else []
@@ -0,0 +1,335 @@
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from memory.doc_buffer import Text
+from memory.eviction import approx_item_bytes
+from memory.partitioned import PartitionedStore, RowPartition
+from memory.snapshot import read_snapshot, write_snapshot
+from memory.vector_store import SCORING_MODES, snapshot_runs, vectorize
+
+
+class _CSRPartition(RowPartition):
+    """CSR term matrix and row norms for one session, next to its per-row records."""
+
+    def __init__(self, capacity: int = 64):
+        super().__init__(capacity)
+        self.nnz = 0
+        self.indptr = np.zeros(capacity + 1, dtype=np.int64)
+        self.indices = np.empty(capacity * 16, dtype=np.int32)
+        self.data = np.empty(capacity * 16, dtype=np.float32)
+        self.norms = np.empty(capacity, dtype=np.float64)
+        self._row_of_nnz: np.ndarray | None = None
+        # BM25 statistics: built from the arrays on first use, then kept up to date
+        self._df: np.ndarray | None = None
+        self._lens: np.ndarray | None = None
+        self._total_len = 0.0
+
+    def append(self, vid: str, text: Text, meta: Dict, digest: str, seq: int, term_ids: List[int], counts: List[int]) -> None:
+        self.extend([vid], [text], [meta], [digest], [seq], [term_ids], [counts])
+
+    def extend(
+        self,
+        vids: List[str],
+        texts: List[Text],
+        metas: List[Dict],
+        digests: List[str],
+        seqs: List[int],
+        term_ids: List[List[int]],
+        counts: List[List[int]],
+    ) -> None:
+        """Append rows with one reservation and one bulk copy into the CSR arrays."""
+        row = len(self.ids)
+        lengths = [len(t) for t in term_ids]
+        added = sum(lengths)
+        self._reserve(row + len(vids), self.nnz + added)
+        end = self.nnz + added
+        self.indices[self.nnz : end] = [t for ids in term_ids for t in ids]
+        self.data[self.nnz : end] = [c for cs in counts for c in cs]
+        self.indptr[row + 1 : row + 1 + len(vids)] = self.nnz + np.cumsum(lengths, dtype=np.int64)
+        self.nnz = end
+        self.norms[row : row + len(vids)] = [math.sqrt(sum(c * c for c in cs)) or 1.0 for cs in counts]
+        if self._df is not None:
+            self._update_bm25_stats(term_ids, counts)
+        self._extend_records(vids, texts, metas, digests, seqs)
+
+    def batch_top(
+        self,
+        q_terms: np.ndarray,
+        q_index: np.ndarray,
+        q_weights: np.ndarray,
+        qnorms: np.ndarray,
+        top_k: int,
+        vocab_size: int,
+        bm25: Tuple[float, float] | None = None,
+    ) -> List[List[Tuple[float, int]]]:
+        """Top-k (score, row) pairs of live rows for several queries, best first, ties by row.
+
+        Queries are given as parallel (term id, query index, weight) triples.
+        One pass over the nonzeros picks out the hits on query terms; each hit
+        is fanned out to the queries that contain its term and summed per
+        (query, row), so the work grows with the hits rather than with
+        queries x rows. Queries with fewer than `top_k` hits are padded with
+        zero-score rows in insertion order, as `VectorStore` does.
+        """
+        n, nnz, n_queries = len(self.ids), self.nnz, len(qnorms)
+        terms = self.indices[:nnz]
+        q_present = np.zeros(vocab_size, dtype=bool)
+        q_present[q_terms] = True
+        hit = np.flatnonzero(q_present[terms])
+        rows = self._nnz_rows()[hit]
+        if self.dead:
+            live = self.alive[rows]
+            hit, rows = hit[live], rows[live]
+        tf = self.data[hit].astype(np.float64)
+        hit_terms = terms[hit]
+        if bm25 is not None:
+            k1, b = bm25
+            live_rows = len(self)
+            df, lens = self._bm25_stats(vocab_size)
+            avgdl = self._total_len / live_rows if live_rows and self._total_len else 1.0
+            saturation = tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * lens[rows] / avgdl))
+            q_weights = q_weights * np.log(1.0 + (live_rows - df[q_terms] + 0.5) / (df[q_terms] + 0.5))
+        else:
+            saturation = tf
+        # fan hits out to queries: group the query triples by term
+        order = np.argsort(q_terms, kind="stable")
+        q_terms, q_index, q_weights = q_terms[order], q_index[order], q_weights[order]
+        q_count = np.bincount(q_terms, minlength=vocab_size)
+        q_start = np.cumsum(q_count) - q_count
+        fan = q_count[hit_terms]
+        rep = np.repeat(np.arange(len(hit)), fan)
+        pos = np.repeat(q_start[hit_terms] - (np.cumsum(fan) - fan), fan) + np.arange(int(fan.sum()))
+        keys, inverse = np.unique(q_index[pos] * n + rows[rep], return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=q_weights[pos] * saturation[rep], minlength=len(keys))
+        key_q, key_rows = keys // n, keys % n
+        if bm25 is None:
+            sums = sums / (qnorms[key_q] * self.norms[key_rows])
+        # rank within each query: score descending, then row (insertion order)
+        ranked = np.lexsort((key_rows, -sums, key_q))
+        key_q, key_rows, sums = key_q[ranked], key_rows[ranked], sums[ranked]
+        starts = np.searchsorted(key_q, np.arange(n_queries + 1))
+        live_rows = np.flatnonzero(self.alive[:n]) if self.dead else None
+        results = []
+        for qi in range(n_queries):
+            a, b = starts[qi], starts[qi + 1]
+            top = list(zip(sums[a : min(b, a + top_k)].tolist(), key_rows[a : min(b, a + top_k)].tolist()))
+            if len(top) < top_k:
+                taken = set(key_rows[a:b].tolist())
+                # only the first hits-plus-k live rows can be needed as padding
+                span = top_k + (b - a)
+                candidates = live_rows[:span].tolist() if live_rows is not None else range(min(n, span))
+                for row in candidates:
+                    if len(top) >= top_k:
+                        break
+                    if row not in taken:
+                        top.append((0.0, row))
+            results.append(top)
+        return results
+
+    def _bm25_stats(self, vocab_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._df is None:
+            n, nnz = len(self.ids), self.nnz
+            live_nnz = self.alive[self._nnz_rows()]
+            self._df = np.bincount(self.indices[:nnz][live_nnz], minlength=vocab_size).astype(np.int64)
+            self._lens = np.bincount(self._nnz_rows(), weights=self.data[:nnz], minlength=n)
+            self._lens[~self.alive[:n]] = 0.0
+            self._total_len = float(self._lens.sum())
+        if len(self._df) < vocab_size:
+            self._df = _grow(self._df, vocab_size)
+        return self._df, self._lens
+
+    def _update_bm25_stats(self, term_ids: List[List[int]], counts: List[List[int]]) -> None:
+        flat = [t for ids in term_ids for t in ids]
+        if flat and max(flat) >= len(self._df):
+            self._df = _grow(self._df, max(max(flat) + 1, 2 * len(self._df)))
+        np.add.at(self._df, flat, 1)
+        new_lens = [float(sum(cs)) for cs in counts]
+        self._lens = np.concatenate([self._lens, new_lens])
+        self._total_len += sum(new_lens)
+
+    def _forget_row(self, row: int) -> None:
+        if self._df is not None:
+            a, b = int(self.indptr[row]), int(self.indptr[row + 1])
+            np.subtract.at(self._df, self.indices[a:b], 1)
+            self._total_len -= self._lens[row]
+            self._lens[row] = 0.0
+
+    def _compact_arrays(self, keep: np.ndarray) -> None:
+        n, nnz = len(self.ids), self.nnz
+        keep_nnz = self.alive[self._nnz_rows()]
+        lengths = np.diff(self.indptr[: n + 1])[keep]
+        self.indices = np.ascontiguousarray(self.indices[:nnz][keep_nnz])
+        self.data = np.ascontiguousarray(self.data[:nnz][keep_nnz])
+        self.nnz = len(self.indices)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.norms = np.ascontiguousarray(self.norms[:n][keep])
+        self._row_of_nnz = None
+        self._df = self._lens = None
+
+    def _nnz_rows(self) -> np.ndarray:
+        # nnz only grows, so a length mismatch means rows were added since
+        if self._row_of_nnz is None or len(self._row_of_nnz) != self.nnz:
+            n = len(self.ids)
+            self._row_of_nnz = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr[: n + 1]))
+        return self._row_of_nnz
+
+    def _reserve(self, rows: int, nnz: int) -> None:
+        # loaded snapshots may hold read-only memory maps; copy them on first write
+        if rows + 1 > len(self.indptr) or not self.norms.flags.writeable:
+            size = max(rows + 1, 2 * len(self.indptr))
+            self.indptr = _grow(self.indptr, size)
+            self.norms = _grow(self.norms, size - 1)
+            self.alive = _grow(self.alive, size - 1)
+        if nnz > len(self.indices) or not self.indices.flags.writeable:
+            size = max(nnz, 2 * len(self.indices))
+            self.indices = _grow(self.indices, size)
+            self.data = _grow(self.data, size)
+
+
+class SparseVectorStore(PartitionedStore):
+    """Bag-of-words vector store backed by CSR term matrices.
+
+    Drop-in for `VectorStore`: same `add`/`search`/`get_text` API and the same
+    cosine scores, but a search is vectorized over a session partition's
+    nonzeros instead of looping per item: the entries on query terms are
+    picked out in one pass, fanned out to the queries containing each term
+    and summed per (query, row), and the top-k per query is taken with a
+    `lexsort` (see `_CSRPartition.batch_top`). BM25 scoring, content-hash
+    deduplication, O(1) session drops and capacity/TTL eviction behave as
+    in `VectorStore`.
+    """
+
+    def __init__(
+        self,
+        scoring: str = "cosine",
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_items: int | None = None,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+        eviction: str = "lru",
+    ):
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {scoring}")
+        super().__init__(max_items=max_items, max_bytes=max_bytes, ttl_seconds=ttl_seconds, eviction=eviction)
+        self.scoring = scoring
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+
+    def _new_partition(self) -> _CSRPartition:
+        return _CSRPartition()
+
+    def _insert(
+        self,
+        part: _CSRPartition,
+        vids: List[str],
+        sources: List[Text],
+        texts: List[str],
+        metas: List[Dict],
+        digests: List[str],
+        seqs: List[int],
+    ) -> None:
+        term_ids, counts = [], []
+        for text in texts:
+            vec = vectorize(text)
+            term_ids.append([self.vocab.setdefault(tok, len(self.vocab)) for tok in vec])
+            counts.append(list(vec.values()))
+        part.extend(vids, sources, metas, digests, seqs, term_ids, counts)
+
+    def _item_bytes(self, part: _CSRPartition, row: int, text: Text) -> int:
+        return approx_item_bytes(text, int(part.indptr[row + 1] - part.indptr[row]))
+
+    def search_many(self, queries: List[str], top_k: int = 3, session: str | None = None) -> List[List[Tuple[str, float]]]:
+        """`search` for several queries at once, with one pass over each partition's nonzeros."""
+        parts = self._search_partitions(session)
+        if not parts or top_k <= 0:
+            return [[] for _ in queries]
+        q_terms, q_index, q_weights, qnorms = [], [], [], []
+        for qi, query in enumerate(queries):
+            qvec = vectorize(query)
+            qnorms.append(math.sqrt(sum(v * v for v in qvec.values())) or 1.0)
+            for tok, val in qvec.items():
+                tid = self.vocab.get(tok)
+                if tid is not None:
+                    q_terms.append(tid)
+                    q_index.append(qi)
+                    q_weights.append(val)
+        q_terms_arr = np.asarray(q_terms, dtype=np.int64)
+        q_index_arr = np.asarray(q_index, dtype=np.int64)
+        q_weights_arr = np.asarray(q_weights, dtype=np.float64)
+        qnorms_arr = np.asarray(qnorms)
+        bm25 = (self.k1, self.b) if self.scoring == "bm25" else None
+        hits: List[List[Tuple[float, int, str]]] = [[] for _ in queries]
+        for part in parts:
+            ranked = part.batch_top(q_terms_arr, q_index_arr, q_weights_arr, qnorms_arr, top_k, len(self.vocab), bm25)
+            for qi, top in enumerate(ranked):
+                hits[qi].extend((score, part.seqs[r], part.ids[r]) for score, r in top)
+        return self._rank(hits, top_k)
+
+    def save(self, path: str) -> str:
+        # partitions are written back to back, so a loaded partition is a
+        # contiguous slice of each array
+        parts = list(self.partitions.values())
+        for part in parts:
+            part.compact()
+        indptr = [np.zeros(1, dtype=np.int64)]
+        offset = 0
+        for part in parts:
+            indptr.append(part.indptr[1 : len(part) + 1] + offset)
+            offset += part.nnz
+        return write_snapshot(
+            path,
+            vocab=list(self.vocab),
+            indptr=np.concatenate(indptr),
+            indices=np.concatenate([p.indices[: p.nnz] for p in parts] or [np.zeros(0, dtype=np.int32)]),
+            data=np.concatenate([p.data[: p.nnz] for p in parts] or [np.zeros(0, dtype=np.float32)]),
+            norms=np.concatenate([p.norms[: len(p)] for p in parts] or [np.zeros(0)]),
+            **self._snapshot_records(),
+        )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs) -> "SparseVectorStore":
+        """Load a snapshot; with `mmap` the arrays and texts stay on disk until touched.
+
+        A session's run of rows is mapped as it is: no per-row work happens
+        unless the store is bounded (every row is then admitted to the
+        capacity policy). Extra keyword arguments (e.g. `scoring`) go to the
+        constructor.
+        """
+        snap = read_snapshot(path, mmap=mmap)
+        store = cls(**kwargs)
+        store.vocab = dict(zip(snap.vocab, range(len(snap.vocab))))
+        for session, start, end in snapshot_runs(snap):
+            part = store.partitions.get(session)
+            if part is None:
+                # map the session's contiguous run of rows without copying
+                part = store.partitions[session] = _CSRPartition(capacity=0)
+                lo, hi = int(snap.indptr[start]), int(snap.indptr[end])
+                part.indptr = np.asarray(snap.indptr[start : end + 1]) - lo
+                part.indices = snap.indices[lo:hi]
+                part.data = snap.data[lo:hi]
+                part.norms = snap.norms[start:end]
+                part.nnz = hi - lo
+                part.map_records(snap, start, end)
+            else:
+                # a session split across the snapshot (older layouts): append row by row
+                for row in range(start, end):
+                    a, b = int(snap.indptr[row]), int(snap.indptr[row + 1])
+                    term_ids, counts = snap.indices[a:b].tolist(), snap.data[a:b].tolist()
+                    part.append(snap.ids[row], snap.texts[row], snap.metas[row], snap.hashes[row], row, term_ids, counts)
+                    part.refs[-1] = int(snap.refs[row]) if snap.refs is not None else 1
+        store._seq = len(snap.ids)
+        if store.capacity.enabled:
+            for part in store.partitions.values():
+                store._admit(part, part.ids, part.texts)
+            store.evict()
+        return store
+
+
+def _grow(arr: np.ndarray, size: int) -> np.ndarray:
+    out = np.zeros(size, dtype=arr.dtype)
+    out[: len(arr)] = arr
+    return out
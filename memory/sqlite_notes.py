@@ -0,0 +1,129 @@
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_session ON notes (session, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5 (text, content='notes', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def fts_phrase(query: str) -> str:
+    """FTS5 phrase for the word tokens of `query` (quoted, so operators in user text stay literal)."""
+    return '"' + " ".join(_TOKEN_RE.findall(query)) + '"'
+
+
+class SQLiteNoteStore:
+    """Episodic notes in one SQLite database, full-text indexed with FTS5.
+
+    Notes go in a plain `notes` table (session, text, insert time) mirrored
+    into an external-content FTS5 index by triggers. The database runs in
+    WAL mode, so readers never block the writer; each batch of notes is one
+    transaction. Searches match the query's words as a phrase within the
+    session and rank hits by BM25.
+    """
+
+    def __init__(self, memory_dir: str, filename: str = "notes.db"):
+        os.makedirs(memory_dir, exist_ok=True)
+        self.path = os.path.join(memory_dir, filename)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def location(self, session: str) -> str:
+        return self.path
+
+    def append(self, notes: Sequence[str], session: str = "default") -> str:
+        """Insert a batch of notes in one transaction; returns the database path."""
+        now = time.time()
+        rows = [(session, note.strip(), now) for note in notes if note.strip()]
+        with self._conn:
+            self._conn.executemany("INSERT INTO notes (session, text, created) VALUES (?, ?, ?)", rows)
+        return self.path
+
+    def search(self, query: str, session: str = "default", top_k: int = 3) -> List[str]:
+        if _TOKEN_RE.search(query):
+            cur = self._conn.execute(
+                "SELECT notes.text FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid"
+                " WHERE notes_fts MATCH ? AND notes.session = ? ORDER BY notes_fts.rank LIMIT ?",
+                (fts_phrase(query), session, top_k),
+            )
+        else:
+            # nothing for the full-text index to match on: fall back to a substring scan
+            cur = self._conn.execute(
+                "SELECT text FROM notes WHERE session = ? AND instr(lower(text), ?) > 0 ORDER BY id LIMIT ?",
+                (session, query.lower(), top_k),
+            )
+        return [text for (text,) in cur]
+
+    def notes(self, session: str = "default") -> Iterator[str]:
+        for (text,) in self._conn.execute("SELECT text FROM notes WHERE session = ? ORDER BY id", (session,)):
+            yield text
+
+    def has_session(self, session: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM notes WHERE session = ? LIMIT 1", (session,)).fetchone() is not None
+
+    def sessions(self) -> List[str]:
+        return [session for (session,) in self._conn.execute("SELECT DISTINCT session FROM notes ORDER BY session")]
+
+    def compact(
+        self,
+        session: str,
+        retention_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Drop expired notes, older duplicates and the oldest notes beyond `max_bytes`, in one transaction.
+
+        WAL readers keep their snapshot while this runs; writers wait for the commit.
+        """
+        stats = {"expired": 0, "duplicates": 0, "over_cap": 0}
+        with self._conn:
+            if retention_seconds is not None:
+                cur = self._conn.execute(
+                    "DELETE FROM notes WHERE session = ? AND created < ?", (session, time.time() - retention_seconds)
+                )
+                stats["expired"] = cur.rowcount
+            cur = self._conn.execute(
+                "DELETE FROM notes WHERE session = ? AND id NOT IN"
+                " (SELECT max(id) FROM notes WHERE session = ? GROUP BY text)",
+                (session, session),
+            )
+            stats["duplicates"] = cur.rowcount
+            if max_bytes is not None:
+                cur = self._conn.execute(
+                    "DELETE FROM notes WHERE id IN (SELECT id FROM (SELECT id, sum(length(CAST(text AS BLOB)) + 1)"
+                    " OVER (ORDER BY id DESC) AS total FROM notes WHERE session = ?) WHERE total > ?)",
+                    (session, max_bytes),
+                )
+                stats["over_cap"] = cur.rowcount
+            self._conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+        return stats
+
+    def flush(self) -> None:
+        """Nothing to do: every batch is committed as it is appended."""
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "SQLiteNoteStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
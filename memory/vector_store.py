@@ -1,39 +1,632 @@
+import hashlib
+import heapq
 import math
 import uuid
+from array import array
 from collections import Counter
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from memory.doc_buffer import Text, resolve_text
+from memory.eviction import CapacityPolicy, approx_item_bytes
+from memory.lsh import MinHashLSH
+from memory.snapshot import Snapshot, StrColumn, TextColumn, read_snapshot, write_snapshot
+
+DEFAULT_SESSION = "default"
+SCORING_MODES = ("cosine", "bm25")
+
+
+def vectorize(text: str) -> Counter:
+    """Lower-cased alphanumeric token counts for `text`."""
+    tokens = [t.lower() for t in text.split() if t.isalpha() or t.isalnum()]
+    return Counter(tokens)
+
+
+def normalize_note(text: str) -> str:
+    """Whitespace-normalized form of a note, used for content addressing."""
+    return " ".join(text.split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(normalize_note(text).encode("utf-8")).hexdigest()
+
+
+def bm25_idf(n_docs: int, df: int) -> float:
+    return math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+def make_vid(session: str) -> str:
+    return f"{session}:{uuid.uuid4()}"
+
+
+def session_of(vid: str) -> str:
+    """Session encoded in a vector id (ids are `<session>:<uuid>`)."""
+    return vid.rpartition(":")[0]
+
+
+def snapshot_runs(snap: Snapshot) -> List[Tuple[str, int, int]]:
+    """`(session, start, end)` runs of a snapshot's rows, in row order.
+
+    Version 1 snapshots do not record them, so they are recovered row by
+    row; on the way, ids from pre-partition snapshots get a session prefix
+    and missing content hashes are recomputed.
+    """
+    if snap.hashes is None:
+        snap.hashes = StrColumn.of([content_hash(t) for t in snap.texts])
+    if snap.sessions is not None:
+        return snap.sessions
+    runs: List[Tuple[str, int, int]] = []
+    ids = []
+    for row, (vid, meta) in enumerate(zip(snap.ids, snap.metas)):
+        if ":" in vid:
+            session = session_of(vid)
+        else:
+            session = meta.get("session", DEFAULT_SESSION)
+            vid = f"{session}:{vid}"
+        ids.append(vid)
+        if runs and runs[-1][0] == session:
+            runs[-1] = (session, runs[-1][1], row + 1)
+        else:
+            runs.append((session, row, row + 1))
+    snap.ids = StrColumn.of(ids)
+    snap.sessions = runs
+    return runs
+
+
+# items are addressed internally by `(partition number << _SLOT_BITS) | slot`;
+# the public id is `<session>:<that number>`, so `session_of` applies to it too
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+
+
+def _hash_key(digest: str) -> int:
+    """64-bit dedup key from a content hash; hits are confirmed against the stored text."""
+    return int(digest[:16], 16)
+
+
+def _hash_keys(digests: np.ndarray) -> np.ndarray:
+    """`_hash_key` of every hex digest in a bytes array, as uint64."""
+    nibbles = np.zeros(256, dtype=np.uint64)
+    nibbles[np.frombuffer(b"0123456789abcdef", dtype=np.uint8)] = np.arange(16, dtype=np.uint64)
+    raw = np.ascontiguousarray(digests.astype("S16")).view(np.uint8).reshape(-1, 16)
+    shifts = np.arange(60, -4, -4, dtype=np.uint64)
+    return np.bitwise_or.reduce(nibbles[raw] << shifts, axis=1)
+
+
+class _Item:
+    """Per-item fields that are not numeric; everything else lives in partition columns.
+
+    A span item also keeps its term ids, since its text may no longer be
+    readable by the time it is removed.
+    """
+
+    __slots__ = ("meta", "refs", "terms")
+
+    def __init__(self, meta: Dict, refs: int, terms: Optional[array] = None):
+        self.meta = meta
+        self.refs = refs
+        self.terms = terms
+
+
+class _Partition:
+    """Items and inverted index for one session, held in per-slot `array` columns.
+
+    A removed item leaves a None record so the other slots stay valid.
+    """
+
+    __slots__ = ("session", "num", "records", "texts", "snapshot_texts", "norms", "lengths", "seqs", "sizes", "keys", "postings", "df", "by_hash", "live", "stale", "total_len", "bytes", "lsh")
+
+    def __init__(self, session: str, num: int, lsh: Optional[MinHashLSH] = None):
+        self.session = session
+        self.num = num
+        self.records: List[Optional[_Item]] = []
+        # the string, a `DocSpan` read on each access, or None for a row of `snapshot_texts`
+        self.texts: List[Optional[Text]] = []
+        self.snapshot_texts: Optional[TextColumn] = None
+        self.norms = array("d")
+        self.lengths = array("I")
+        self.seqs = array("Q")
+        self.sizes = array("I")
+        self.keys = array("Q")
+        # term id -> interleaved (slot, count) pairs; the only copy of term counts
+        self.postings: Dict[int, array] = {}
+        # live document frequencies while removed items are still in the postings
+        self.df: Optional[Dict[int, int]] = None
+        self.by_hash: Dict[int, int] = {}
+        self.live = 0
+        self.stale = 0  # removed items still listed in postings
+        self.total_len = 0  # token count over all items, for BM25's average length
+        self.bytes = 0  # approximate size, tracked only when the store is bounded
+        self.lsh = lsh  # approximate candidate index, when the store has one
+
+    def text(self, slot: int) -> str:
+        source = self.texts[slot]
+        return resolve_text(source) if source is not None else self.snapshot_texts[slot]
+
+    def doc_freq(self, tid: int) -> int:
+        if self.df is not None:
+            return self.df.get(tid, 0)
+        posting = self.postings.get(tid)
+        return len(posting) // 2 if posting else 0
+
+    def compact(self) -> None:
+        """Drop removed items from the postings."""
+        records = self.records
+        postings: Dict[int, array] = {}
+        for tid, posting in self.postings.items():
+            pairs = iter(posting)
+            kept = array("I")
+            for slot, count in zip(pairs, pairs):
+                if records[slot] is not None:
+                    kept.append(slot)
+                    kept.append(count)
+            if kept:
+                postings[tid] = kept
+        self.postings = postings
+        self.df = None
+        self.stale = 0
+
+    def rows(self) -> Tuple[List[int], np.ndarray, np.ndarray, np.ndarray]:
+        """Live slots and their rows as CSR arrays (indptr, term ids, counts), transposed from the postings."""
+        slots = [slot for slot, item in enumerate(self.records) if item is not None]
+        if not self.postings:
+            return slots, np.zeros(len(slots) + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        pairs = np.concatenate([np.frombuffer(p, dtype=np.uint32) for p in self.postings.values()]).reshape(-1, 2)
+        tids = np.repeat(np.fromiter(self.postings, dtype=np.int32), [len(p) // 2 for p in self.postings.values()])
+        alive = np.zeros(len(self.records), dtype=bool)
+        alive[slots] = True
+        keep = alive[pairs[:, 0]]
+        pairs, tids = pairs[keep], tids[keep]
+        order = np.argsort(pairs[:, 0], kind="stable")
+        row_of = np.cumsum(alive) - 1  # slot -> live row
+        indptr = np.zeros(len(slots) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_of[pairs[:, 0]], minlength=len(slots)), out=indptr[1:])
+        return slots, indptr, tids[order], pairs[order, 1].astype(np.float32)
 
 
 class VectorStore:
-    """Lightweight bag-of-words vector store with cosine similarity."""
+    """Lightweight bag-of-words vector store with cosine or BM25 scoring.
+
+    Items are partitioned by session, and each partition keeps an inverted
+    index, so a search only scores items of the queried session that share
+    a token with the query.
+    """
+
+    def __init__(
+        self,
+        scoring: str = "cosine",
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_items: int | None = None,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+        eviction: str = "lru",
+        lsh_bands: int | None = None,
+        lsh_rows: int = 4,
+    ):
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {scoring}")
+        self.scoring = scoring
+        self.k1 = k1
+        self.b = b
+        self.lsh_bands = lsh_bands
+        self.lsh_rows = lsh_rows
+        self.vocab: Dict[str, int] = {}
+        self.partitions: Dict[str, _Partition] = {}
+        self._by_num: Dict[int, _Partition] = {}
+        self._next_num = 0
+        self._seq = 0
+        self.dedup_stats = {"vectors_saved": 0, "bytes_saved": 0}
+        self.capacity = CapacityPolicy(max_items=max_items, max_bytes=max_bytes, ttl_seconds=ttl_seconds, policy=eviction)
+
+    @property
+    def eviction_stats(self) -> Dict[str, int]:
+        return self.capacity.stats
+
+    def __len__(self) -> int:
+        return sum(p.live for p in self.partitions.values())
 
-    def __init__(self):
-        self.items: Dict[str, Dict] = {}
+    def partition_size(self, session: str) -> int:
+        part = self.partitions.get(session)
+        return part.live if part else 0
+
+    def drop_session(self, session: str) -> int:
+        """Forget a whole session partition in O(1); returns how many items it held."""
+        part = self.partitions.pop(session, None)
+        if part is None:
+            return 0
+        del self._by_num[part.num]
+        if self.capacity.enabled:
+            self.capacity.release(part.live, part.bytes)
+        return part.live
+
+    def _partition(self, session: str) -> _Partition:
+        part = self.partitions.get(session)
+        if part is None:
+            lsh = MinHashLSH(self.lsh_bands, self.lsh_rows) if self.lsh_bands else None
+            part = self.partitions[session] = self._by_num[self._next_num] = _Partition(session, self._next_num, lsh)
+            self._next_num += 1
+        return part
 
     def _vectorize(self, text: str) -> Counter:
-        tokens = [t.lower() for t in text.split() if t.isalpha() or t.isalnum()]
-        return Counter(tokens)
-
-    def add(self, text: str, metadata: Dict | None = None) -> str:
-        vid = str(uuid.uuid4())
-        vec = self._vectorize(text)
-        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
-        self.items[vid] = {"text": text, "vec": vec, "norm": norm, "meta": metadata or {}}
+        return vectorize(text)
+
+    def add(self, text: Text, metadata: Dict | None = None, session: str | None = None) -> str:
+        return self.add_many([text], metadata=metadata, session=session)[0]
+
+    def add_many(self, texts: List[Text], metadata: Dict | None = None, session: str | None = None) -> List[str]:
+        """Index a batch of texts into one session; returns one `<session>:<number>` id per input text.
+
+        Items of a batch share one copy of `metadata`, which is treated as
+        read-only. Texts are content-addressed: a repeat (within the batch
+        or already stored in the session) returns the existing id and bumps
+        its refcount. A `DocSpan` is stored as the span and read back
+        through its document buffer. In a bounded store (`max_items`,
+        `max_bytes`, `ttl_seconds`) items are then evicted, least recently
+        hit or oldest first.
+        """
+        metadata = dict(metadata or {})
+        session = session or metadata.get("session", DEFAULT_SESSION)
+        part = self._partition(session)
+        base = part.num << _SLOT_BITS
+        vocab = self.vocab
+        vids = []
+        for source in texts:
+            text = resolve_text(source)
+            key = _hash_key(content_hash(text))
+            existing = part.by_hash.get(key)
+            if existing is not None and normalize_note(part.text(existing)) == normalize_note(text):
+                part.records[existing].refs += 1
+                self.capacity.touch(base | existing)
+                self.dedup_stats["vectors_saved"] += 1
+                self.dedup_stats["bytes_saved"] += len(text.encode("utf-8"))
+                vids.append(self._public_id(base | existing))
+                continue
+            vec = self._vectorize(text)
+            terms = [vocab.setdefault(tok, len(vocab)) for tok in vec]
+            counts = list(vec.values())
+            norm = math.sqrt(sum(v * v for v in counts)) or 1.0
+            vids.append(self._public_id(self._insert(part, source, terms, counts, norm, metadata, key, refs=1)))
+        self.evict()
+        return vids
+
+    def _insert(self, part: _Partition, text: Text, terms: List[int], counts: List[int], norm: float, meta: Dict, key: int, refs: int) -> int:
+        slot = len(part.records)
+        length = sum(counts)
+        part.records.append(_Item(meta, refs, None if isinstance(text, str) else array("I", terms)))
+        part.texts.append(text)
+        part.norms.append(norm)
+        part.lengths.append(length)
+        part.seqs.append(self._seq)
+        part.keys.append(key)
+        part.by_hash.setdefault(key, slot)
+        part.live += 1
+        part.total_len += length
+        self._seq += 1
+        df = part.df
+        for tid, count in zip(terms, counts):
+            posting = part.postings.get(tid)
+            if posting is None:
+                posting = part.postings[tid] = array("I")
+            posting.append(slot)
+            posting.append(count)
+            if df is not None:
+                df[tid] = df.get(tid, 0) + 1
+        if part.lsh is not None:
+            part.lsh.add(slot, terms)
+        vid = (part.num << _SLOT_BITS) | slot
+        nbytes = 0
+        if self.capacity.enabled:
+            nbytes = approx_item_bytes(text, len(terms))
+            part.bytes += nbytes
+            self.capacity.admit(vid, nbytes)
+        part.sizes.append(nbytes)
         return vid
 
-    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
-        qvec = self._vectorize(query)
-        qnorm = math.sqrt(sum(v * v for v in qvec.values())) or 1.0
-        scores = []
-        for vid, item in self.items.items():
-            score = self._cosine(qvec, qnorm, item["vec"], item["norm"])
-            scores.append((vid, score))
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+    def evict(self) -> int:
+        """Expire items past their TTL and evict until within capacity; returns how many were removed."""
+        if not self.capacity.enabled:
+            return 0
+        removed = 0
+        for vid, _ in self.capacity.victims(self._exists):
+            self._remove(vid)
+            removed += 1
+        return removed
 
-    def get_text(self, vid: str) -> str:
-        return self.items.get(vid, {}).get("text", "")
+    def _public_id(self, vid: int) -> str:
+        return f"{self._by_num[vid >> _SLOT_BITS].session}:{vid}"
+
+    def _internal_id(self, vid: str) -> Optional[int]:
+        """Packed id behind a public one; None for ids this store did not issue."""
+        session, _, num = str(vid).rpartition(":")
+        if not num.isdigit():
+            return None
+        part = self._by_num.get(int(num) >> _SLOT_BITS)
+        return int(num) if part is not None and part.session == session else None
 
-    def _cosine(self, qvec: Counter, qnorm: float, dvec: Counter, dnorm: float) -> float:
-        dot = sum(val * dvec.get(tok, 0) for tok, val in qvec.items())
-        return dot / (qnorm * dnorm) if qnorm and dnorm else 0.0
+    def _record(self, vid: int) -> Optional[_Item]:
+        part = self._by_num.get(vid >> _SLOT_BITS)
+        slot = vid & _SLOT_MASK
+        if part is None or slot >= len(part.records):
+            return None
+        return part.records[slot]
+
+    def _exists(self, vid: int) -> bool:
+        return self._record(vid) is not None
+
+    def _remove(self, vid: int) -> None:
+        part = self._by_num[vid >> _SLOT_BITS]
+        slot = vid & _SLOT_MASK
+        item = part.records[slot]
+        text = part.text(slot) if item.terms is None else ""
+        part.records[slot] = None
+        part.texts[slot] = None
+        if part.df is None:
+            part.df = {tid: len(posting) // 2 for tid, posting in part.postings.items()}
+        # term ids are only stored for span items; re-tokenizing an evicted text is cheaper than keeping them
+        if item.terms is not None:
+            terms = item.terms
+        else:
+            terms = [self.vocab[tok] for tok in self._vectorize(text)]
+        for tid in terms:
+            part.df[tid] -= 1
+        if part.lsh is not None:
+            part.lsh.remove(slot, terms)
+        key = part.keys[slot]
+        if part.by_hash.get(key) == slot:
+            del part.by_hash[key]
+        part.live -= 1
+        part.total_len -= part.lengths[slot]
+        part.bytes -= part.sizes[slot]
+        part.stale += 1
+        if part.stale * 2 > part.live:
+            part.compact()
+
+    def search(self, query: str, top_k: int = 3, session: str | None = None) -> List[Tuple[str, float]]:
+        """Top-k items by the store's scoring mode, within `session` if given, else across all sessions."""
+        return self.search_many([query], top_k=top_k, session=session)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 3, session: str | None = None) -> List[List[Tuple[str, float]]]:
+        """`search` for several queries at once; each posting list is walked once for all of them.
+
+        Each partition is its own BM25 corpus. With `lsh_bands` set, the
+        search is approximate: a partition's MinHash LSH index (`lsh_bands`
+        tables of `lsh_rows` values) proposes candidates, which are scored
+        exactly from their texts. This suits queries that resemble stored
+        notes; short keyword queries share too few tokens with long notes to
+        collide reliably.
+        """
+        if self.capacity.ttl_seconds is not None:
+            self.evict()
+        if session is not None:
+            parts = [self.partitions[session]] if session in self.partitions else []
+        else:
+            parts = list(self.partitions.values())
+        qvecs, qnorms, qterms = [], [], []
+        # term id -> [(query index, weight)]; query tokens never indexed cannot match
+        by_term: Dict[int, List[Tuple[int, int]]] = {}
+        for qi, query in enumerate(queries):
+            qvec = self._vectorize(query)
+            qvecs.append(qvec)
+            qnorms.append(math.sqrt(sum(v * v for v in qvec.values())) or 1.0)
+            qterms.append([self.vocab[tok] for tok in qvec if tok in self.vocab])
+            for tok, val in qvec.items():
+                tid = self.vocab.get(tok)
+                if tid is not None:
+                    by_term.setdefault(tid, []).append((qi, val))
+        scored: List[List[Tuple[float, int, int]]] = [[] for _ in queries]
+        for part in parts:
+            if part.lsh is not None:
+                part_scores = [
+                    self._rerank(part, qvec, qnorm, part.lsh.candidates(tids))
+                    for qvec, qnorm, tids in zip(qvecs, qnorms, qterms)
+                ]
+            elif self.scoring == "bm25":
+                part_scores = self._bm25(part, by_term, len(queries))
+            else:
+                part_scores = self._cosine_scores(part, by_term, qnorms)
+            base = part.num << _SLOT_BITS
+            seqs = part.seqs
+            for qi, slot_scores in enumerate(part_scores):
+                scored[qi].extend((score, -seqs[slot], base | slot) for slot, score in slot_scores.items())
+        results = [self._top(hits, parts, top_k) for hits in scored]
+        if self.capacity.enabled:
+            for top in results:
+                for vid, _ in top:
+                    self.capacity.touch(vid)
+        return [[(self._public_id(vid), score) for vid, score in top] for top in results]
+
+    def _top(self, scored: List[Tuple[float, int, int]], parts: List[_Partition], top_k: int) -> List[Tuple[int, float]]:
+        # ties keep insertion order, matching a stable sort over all items
+        top = [(vid, score) for score, _, vid in heapq.nlargest(top_k, scored)]
+        if len(top) < top_k:
+            # pad with zero-score items in insertion order, as the full scan did
+            hit = {vid for _, _, vid in scored}
+            for _, vid in heapq.merge(*(self._live(p) for p in parts)):
+                if len(top) >= top_k:
+                    break
+                if vid not in hit:
+                    top.append((vid, 0.0))
+        return top
+
+    @staticmethod
+    def _live(part: _Partition):
+        base = part.num << _SLOT_BITS
+        for slot, item in enumerate(part.records):
+            if item is not None:
+                yield part.seqs[slot], base | slot
+
+    def _cosine_scores(self, part: _Partition, by_term: Dict[int, List[Tuple[int, int]]], qnorms: List[float]) -> List[Dict[int, float]]:
+        # accumulate dot products only over items that share a query token
+        dots: List[Dict[int, int]] = [{} for _ in qnorms]
+        for tid, weights in by_term.items():
+            posting = part.postings.get(tid)
+            if posting is None:
+                continue
+            for qi, val in weights:
+                qdots = dots[qi]
+                pairs = iter(posting)
+                for slot, count in zip(pairs, pairs):
+                    qdots[slot] = qdots.get(slot, 0) + val * count
+        records, norms = part.records, part.norms
+        return [
+            {slot: dot / (qnorm * norms[slot]) for slot, dot in qdots.items() if records[slot] is not None}
+            for qdots, qnorm in zip(dots, qnorms)
+        ]
+
+    def _rerank(self, part: _Partition, qvec: Counter, qnorm: float, slots: Set[int]) -> Dict[int, float]:
+        """Exact scores of candidate slots, from their re-tokenized texts."""
+        n_docs = part.live
+        avgdl = (part.total_len / n_docs) if n_docs and part.total_len else 1.0
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+        for slot in slots:
+            dvec = self._vectorize(part.text(slot))
+            if self.scoring == "cosine":
+                dot = sum(val * dvec.get(tok, 0) for tok, val in qvec.items())
+                if dot:
+                    scores[slot] = dot / (qnorm * part.norms[slot])
+                continue
+            score = 0.0
+            for tok, qtf in qvec.items():
+                tf = dvec.get(tok)
+                if tf:
+                    idf = bm25_idf(n_docs, part.doc_freq(self.vocab[tok]))
+                    score += qtf * idf * tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * part.lengths[slot] / avgdl))
+            if score:
+                scores[slot] = score
+        return scores
+
+    def _bm25(self, part: _Partition, by_term: Dict[int, List[Tuple[int, int]]], n_queries: int) -> List[Dict[int, float]]:
+        n_docs = part.live
+        avgdl = (part.total_len / n_docs) if n_docs and part.total_len else 1.0
+        k1, b = self.k1, self.b
+        records, lengths = part.records, part.lengths
+        scores: List[Dict[int, float]] = [{} for _ in range(n_queries)]
+        for tid, weights in by_term.items():
+            posting = part.postings.get(tid)
+            if posting is None:
+                continue
+            idf = bm25_idf(n_docs, part.doc_freq(tid))
+            pairs = iter(posting)
+            for slot, tf in zip(pairs, pairs):
+                if records[slot] is None:
+                    continue
+                # the term's saturation is shared by every query that contains it
+                sat = tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * lengths[slot] / avgdl))
+                for qi, qtf in weights:
+                    qscores = scores[qi]
+                    qscores[slot] = qscores.get(slot, 0.0) + qtf * idf * sat
+        return scores
+
+    def save(self, path: str) -> str:
+        """Write the store in the binary snapshot layout shared with SparseVectorStore."""
+        ids, items, texts, norms, sessions = [], [], [], [], []
+        indptr, indices, data = [np.zeros(1, dtype=np.int64)], [], []
+        for session, part in self.partitions.items():
+            slots, part_indptr, part_indices, part_data = part.rows()
+            sessions.append((session, len(slots)))
+            indptr.append(part_indptr[1:] + indptr[-1][-1])
+            indices.append(part_indices)
+            data.append(part_data)
+            base = part.num << _SLOT_BITS
+            for slot in slots:
+                norms.append(part.norms[slot])
+                ids.append(f"{session}:{base | slot}")
+                items.append(part.records[slot])
+                texts.append(part.text(slot))
+        return write_snapshot(
+            path,
+            vocab=list(self.vocab),
+            ids=ids,
+            metas=[item.meta for item in items],
+            indptr=np.concatenate(indptr),
+            indices=np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+            data=np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+            norms=np.asarray(norms),
+            texts=texts,
+            sessions=sessions,
+            hashes=[content_hash(text) for text in texts],
+            refs=[item.refs for item in items],
+        )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs) -> "VectorStore":
+        """Rebuild a store from a snapshot without re-tokenizing any text.
+
+        Each session's run of rows becomes a partition in bulk: postings are
+        transposed from the CSR arrays with numpy, and texts stay in the
+        (possibly memory-mapped) snapshot until read. Item ids are
+        reassigned. Extra keyword arguments (e.g. `scoring`) go to the
+        constructor.
+        """
+        snap = read_snapshot(path, mmap=mmap)
+        store = cls(**kwargs)
+        remap = np.asarray([store.vocab.setdefault(tok, len(store.vocab)) for tok in snap.vocab], dtype=np.uint32)
+        runs = snapshot_runs(snap)
+        keys = _hash_keys(snap.hashes.array)
+        refs = np.asarray(snap.refs) if snap.refs is not None else np.ones(len(snap.ids), dtype=np.int32)
+        for session, start, end in runs:
+            if session not in store.partitions:
+                store._load_rows(store._partition(session), snap, remap, start, end, keys, refs)
+            else:
+                # a session split across the snapshot (older layouts): insert row by row
+                part = store.partitions[session]
+                for row in range(start, end):
+                    a, b = int(snap.indptr[row]), int(snap.indptr[row + 1])
+                    terms = remap[np.asarray(snap.indices[a:b])].tolist()
+                    counts = np.asarray(snap.data[a:b]).astype(np.int64).tolist()
+                    store._insert(part, snap.texts[row], terms, counts, float(snap.norms[row]), snap.metas[row], int(keys[row]), int(refs[row]))
+        store.evict()
+        return store
+
+    def _load_rows(self, part: _Partition, snap: Snapshot, remap: np.ndarray, start: int, end: int, keys: np.ndarray, refs: np.ndarray) -> None:
+        """Fill an empty partition with snapshot rows `start:end`."""
+        n = end - start
+        lo, hi = int(snap.indptr[start]), int(snap.indptr[end])
+        indptr = np.asarray(snap.indptr[start : end + 1]) - lo
+        tids = remap[np.asarray(snap.indices[lo:hi])]
+        counts = np.asarray(snap.data[lo:hi]).astype(np.uint32)
+        slots = np.repeat(np.arange(n, dtype=np.uint32), np.diff(indptr))
+        lengths = np.bincount(slots, weights=counts, minlength=n).astype(np.uint32)
+        # postings: (slot, count) pairs grouped by term, slots ascending within a term
+        order = np.argsort(tids, kind="stable")
+        pairs = np.empty((hi - lo, 2), dtype=np.uint32)
+        pairs[:, 0] = slots[order]
+        pairs[:, 1] = counts[order]
+        terms, first = np.unique(tids[order], return_index=True)
+        flat = pairs.reshape(-1)
+        for tid, a, b in zip(terms.tolist(), first.tolist(), [*first[1:].tolist(), hi - lo]):
+            part.postings[tid] = array("I", flat[2 * a : 2 * b].tobytes())
+        # metadata dicts come from the snapshot's table, so equal ones stay shared
+        table = snap.metas.table
+        part.records = [_Item(table[m], r) for m, r in zip(snap.metas.index[start:end].tolist(), refs[start:end].tolist())]
+        part.texts = [None] * n
+        part.snapshot_texts = snap.texts.rows(start, end)
+        part.norms = array("d", np.asarray(snap.norms[start:end], dtype=np.float64).tobytes())
+        part.lengths = array("I", lengths.tobytes())
+        part.seqs = array("Q", np.arange(self._seq, self._seq + n, dtype=np.uint64).tobytes())
+        part.keys = array("Q", keys[start:end].tobytes())
+        part.sizes = array("I", bytes(4 * n))
+        # reversed, so a key repeated in the run keeps its first slot
+        part.by_hash.update(zip(reversed(part.keys), range(n - 1, -1, -1)))
+        part.live = n
+        part.total_len = int(lengths.sum())
+        self._seq += n
+        if part.lsh is not None:
+            for slot in range(n):
+                part.lsh.add(slot, tids[indptr[slot] : indptr[slot + 1]].tolist())
+        if self.capacity.enabled:
+            base = part.num << _SLOT_BITS
+            for slot in range(n):
+                nbytes = approx_item_bytes(part.text(slot), int(indptr[slot + 1] - indptr[slot]))
+                part.sizes[slot] = nbytes
+                part.bytes += nbytes
+                self.capacity.admit(base | slot, nbytes)
+
+    def get_text(self, vid: str) -> str:
+        internal = self._internal_id(vid)
+        if internal is None or self._record(internal) is None:
+            return ""
+        return self._by_num[internal >> _SLOT_BITS].text(internal & _SLOT_MASK)
@@ -1,12 +1,35 @@
+import mmap
 import os
+import re
+import sys
 import textwrap
 import traceback
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
-from contextlib import redirect_stdout
-import io
+from typing import Any, Dict, List, Optional, Pattern, Tuple
 
-from memory.vector_store import VectorStore
+from memory.doc_buffer import DocSpan, Text, resolve_text
+from memory.facts import Fact, FactIndex
+from memory.memory import NoteStore
+from memory.note_log import TextNoteStore
+from memory.query_cache import QueryCache
+from memory.vector_store import VectorStore, content_hash, normalize_note
+from tools.sandbox import SandboxPool, execute
+
+READ_UNITS = ("chars", "lines", "words")
+READ_BLOCK_CHARS = 1 << 16
+DEFAULT_FILE_CACHE_BYTES = 64 << 20
+_LINE_END_RE = re.compile(rb"\r\n?|\n")
+# the same boundaries in already-decoded (newline-translated) text
+_TEXT_LINE_END_RE = re.compile(r"\n")
+_TEXT_WORD_RE = re.compile(r"\S+")
+# UTF-8 of the characters str.split() treats as whitespace
+_WS_BYTES = rb"(?:[\t-\r\x1c-\x20]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)"
+_WS_LEAD = rb"(?!" + _WS_BYTES + rb")[\xc2\xe1\xe2\xe3]"
+# one str.split() word as UTF-8 bytes; a word never starts on a continuation byte
+_WORD_BYTES_RE = re.compile(
+    rb"(?:[^\t-\r\x1c-\x20\x80-\xbf\xc2\xe1\xe2\xe3]|" + _WS_LEAD + rb")(?:[^\t-\r\x1c-\x20\xc2\xe1\xe2\xe3]|" + _WS_LEAD + rb")*"
+)
 
 
 @dataclass
@@ -22,38 +45,224 @@ class BaseTool:
     def run(self, **kwargs) -> ToolResult:  # pragma: no cover - interface
         raise NotImplementedError
 
+    def close(self) -> None:
+        """Release processes or handles the tool owns."""
+
 
 class PythonExecTool(BaseTool):
     name = "python_exec"
     description = "Execute short Python code snippets in a sandboxed scope"
 
+    def __init__(self, pool: Optional[SandboxPool] = None):
+        self.pool = pool
+
     def run(self, code: str) -> ToolResult:
-        buffer = io.StringIO()
-        local_scope: Dict[str, Any] = {}
+        """Run a snippet in-process, or in an isolated pool worker with time and memory limits."""
+        if self.pool is not None:
+            output, result = self.pool.run(code)
+            return ToolResult(output=output, data=result)
         try:
-            with redirect_stdout(buffer):
-                exec(code, {}, local_scope)
-            result_obj = local_scope.get("result")
-            output_text = buffer.getvalue()
-            if result_obj is not None:
-                output_text += f"\nresult={result_obj!r}"
-            return ToolResult(output=output_text.strip(), data=result_obj)
+            output, result = execute(code)
+            return ToolResult(output=output, data=result)
         except Exception as e:  # noqa: BLE001
             tb = traceback.format_exc(limit=1)
             return ToolResult(output=f"error: {e}\n{tb}")
 
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+
+
+def _read_chars(path: str, start: int, end: Optional[int]) -> str:
+    """Characters `start:end` of a file, streamed so nothing past `end` is read."""
+    with open(path, "r", encoding="utf-8") as f:
+        if start < 0 or (end is not None and end < 0):
+            # offsets from the end need the length; read it all like a plain slice
+            return f.read()[start:end]
+        skip = start
+        while skip > 0:
+            got = len(f.read(min(skip, READ_BLOCK_CHARS)))
+            if not got:
+                return ""
+            skip -= got
+        return f.read() if end is None else f.read(max(end - start, 0))
+
+
+def _read_mapped(path: str, start: int, end: Optional[int], unit: str) -> str:
+    """A line or word window, located in a memory-mapped view so only the window is decoded."""
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            a, b = _window(buf, start, end, unit)
+            # same newline handling as a text-mode read
+            return buf[a:b].decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _text_window(text: str, start: int, end: Optional[int], unit: str) -> str:
+    if unit == "chars":
+        return text[start:end]
+    a, b = _window(text, start, end, unit)
+    return text[a:b]
+
+
+def _window(buf, start: int, end: Optional[int], unit: str) -> Tuple[int, int]:
+    """Index range of lines or words [start, end) of `buf`, either decoded text or raw UTF-8 bytes."""
+    if end is not None and end <= start:
+        return 0, 0
+    text = isinstance(buf, str)
+    if unit == "lines":
+        return _line_window(buf, start, end, _TEXT_LINE_END_RE if text else _LINE_END_RE)
+    return _word_window(buf, start, end, _TEXT_WORD_RE if text else _WORD_BYTES_RE)
+
+
+def _line_window(buf, start: int, end: Optional[int], line_end: Pattern) -> Tuple[int, int]:
+    """Range of lines [start, end) of `buf`; line i begins after the i-th line end."""
+    a = 0 if start == 0 else len(buf)
+    b = len(buf)
+    for i, m in enumerate(line_end.finditer(buf), 1):
+        if i == start:
+            a = m.end()
+        if i == end:
+            b = m.end()
+            break
+    return a, b
+
+
+def _word_window(buf, start: int, end: Optional[int], word: Pattern) -> Tuple[int, int]:
+    """Range from the start of word `start` to the end of word `end - 1` of `buf`."""
+    a = b = len(buf)
+    last = None if end is None else end - 1
+    for i, m in enumerate(word.finditer(buf)):
+        if i == start:
+            a = m.start()
+            if last is None:
+                break
+        if i == last:
+            b = m.end()
+            break
+    return a, b
+
+
+def _file_signature(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class FileCache:
+    """Byte-bounded LRU of decoded file contents.
+
+    Entries are keyed by absolute path and checked against the file's
+    (inode, size, mtime_ns) on every lookup, so an edited or replaced file
+    is read again instead of being served stale. A text larger than the
+    whole budget is not cached.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_FILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int, int], str, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str) -> Optional[str]:
+        key = os.path.abspath(path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            try:
+                current = _file_signature(os.stat(key))
+            except OSError:
+                current = None
+            if current == entry[0]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.bytes -= self._entries.pop(key)[2]
+        self.misses += 1
+        return None
+
+    def load(self, path: str) -> str:
+        """Read and decode a whole file, keeping it for later lookups."""
+        with open(path, "r", encoding="utf-8") as f:
+            # the signature of what was actually read; a write after this changes it
+            signature = _file_signature(os.fstat(f.fileno()))
+            text = f.read()
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return text
+        key = os.path.abspath(path)
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[2]
+        self._entries[key] = (signature, text, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self.bytes -= self._entries.popitem(last=False)[1][2]
+            self.evictions += 1
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+
+_FILE_CACHE: Optional[FileCache] = None
+
+
+def shared_file_cache(max_bytes: int = DEFAULT_FILE_CACHE_BYTES) -> FileCache:
+    """The process-wide file cache, so every agent and condition in the process shares it.
+
+    `max_bytes` only applies when the cache is first created.
+    """
+    global _FILE_CACHE
+    if _FILE_CACHE is None:
+        _FILE_CACHE = FileCache(max_bytes)
+    return _FILE_CACHE
+
 
 class ReadFileTool(BaseTool):
     name = "read_file"
     description = "Read text content from a file path"
 
-    def run(self, path: str, start: int = 0, end: Optional[int] = None) -> ToolResult:
+    def __init__(self, cache: Optional[FileCache] = None):
+        self.cache = cache
+
+    def run(self, path: str, start: int = 0, end: Optional[int] = None, unit: str = "chars", full: bool = False) -> ToolResult:
+        """Text of `path` from `start` to `end`, counted in `unit` (chars, lines or words).
+
+        Only the window is read from disk; `data` holds the full text only
+        when `full` is set.
+        """
+        if unit not in READ_UNITS:
+            raise ValueError(f"Unknown read unit: {unit}")
+        if unit != "chars" and (start < 0 or (end is not None and end < 0)):
+            raise ValueError("line and word windows take non-negative offsets")
         if not os.path.exists(path):
             return ToolResult(output=f"File not found: {path}")
-        with open(path, "r", encoding="utf-8") as f:
-            data = f.read()
-        snippet = data[start:end]
-        return ToolResult(output=snippet, data=data)
+        whole_read = full or (unit == "chars" and start == 0 and end is None)
+        text = None
+        if self.cache is not None:
+            # whole-file reads are cached; later windows of the unchanged file are cut from them
+            text = self.cache.get(path)
+            if text is None and whole_read:
+                text = self.cache.load(path)
+        if text is not None:
+            snippet = _text_window(text, start, end, unit)
+        elif unit == "chars":
+            snippet = _read_chars(path, start, end)
+        else:
+            snippet = _read_mapped(path, start, end, unit)
+        if not full:
+            return ToolResult(output=snippet)
+        if text is None:
+            text = snippet if unit == "chars" and start == 0 and end is None else _read_chars(path, 0, None)
+        return ToolResult(output=snippet, data=text)
 
 
 class WriteFileTool(BaseTool):
@@ -71,52 +280,186 @@ class AppendNoteTool(BaseTool):
     name = "append_note"
     description = "Append a note to episodic memory file"
 
-    def __init__(self, memory_dir: str, vector_store: Optional[VectorStore] = None):
+    def __init__(
+        self,
+        memory_dir: str,
+        vector_store: Optional[VectorStore] = None,
+        cache: Optional[QueryCache] = None,
+        notes: Optional[NoteStore] = None,
+        facts: Optional[FactIndex] = None,
+    ):
         self.memory_dir = memory_dir
-        os.makedirs(memory_dir, exist_ok=True)
+        self._owns_notes = notes is None
+        self.notes = notes if notes is not None else TextNoteStore(memory_dir)
+        self.facts = facts if facts is not None else FactIndex(memory_dir)
         self.vector_store = vector_store
+        self.cache = cache
+        self._seen: Dict[str, set] = {}
+        self.dedup_stats = {"notes_skipped": 0, "bytes_saved": 0}
 
     def run(self, note: str, session: str = "default") -> ToolResult:
-        path = os.path.join(self.memory_dir, f"{session}.notes.txt")
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(note.strip() + "\n")
-        if self.vector_store:
-            self.vector_store.add(note, metadata={"session": session, "source": "note"})
-        return ToolResult(output=f"appended note to {path}")
+        return self.append_notes([note], session=session)
+
+    def close(self) -> None:
+        # a shared note store is closed by its owner
+        if self._owns_notes:
+            self.notes.close()
+
+    def append_notes(self, notes: List[Text], session: str = "default") -> ToolResult:
+        """Append a batch of notes with one buffered write and one vector-store update.
+
+        Notes may be `DocSpan`s: the vector store keeps them as spans, and
+        their text is only materialized here for the note log and fact index.
+        Facts found in a span are recorded for its document only.
+        """
+        if self.cache is not None:
+            self.cache.bump(session)
+        # the store dedups on its own; it may not have seen notes from earlier runs
+        vids = []
+        if self.vector_store is not None:
+            vids = self.vector_store.add_many(notes, metadata={"session": session, "source": "note"}, session=session)
+        texts = [resolve_text(note) for note in notes]
+        by_doc: Dict[str, List[str]] = {}
+        for note, text in zip(notes, texts):
+            by_doc.setdefault(note.doc_id if isinstance(note, DocSpan) else "", []).append(text)
+        # duplicates too, so a key re-ingested from the current document wins
+        for doc, doc_notes in by_doc.items():
+            self.facts.add_notes(doc_notes, session=session, doc=doc)
+        notes = texts
+        seen = self._session_hashes(session)
+        fresh = []
+        for note in notes:
+            digest = content_hash(note)
+            if digest in seen:
+                self.dedup_stats["notes_skipped"] += 1
+                self.dedup_stats["bytes_saved"] += len((note.strip() + "\n").encode("utf-8"))
+                continue
+            seen.add(digest)
+            fresh.append(note)
+        path = self.notes.append(fresh, session=session) if fresh else self.notes.location(session)
+        # `data` holds the vector id of each note (empty without a vector store)
+        if len(notes) == 1:
+            return ToolResult(output=f"appended note to {path}" if fresh else f"note already in {path}", data=vids)
+        return ToolResult(output=f"appended {len(fresh)} of {len(notes)} notes to {path}", data=vids)
+
+    def _session_hashes(self, session: str) -> set:
+        seen = self._seen.get(session)
+        if seen is None:
+            seen = {content_hash(ln) for ln in self.notes.notes(session)}
+            self._seen[session] = seen
+        return seen
+
+
+def _to_cached(result: ToolResult) -> Tuple[str, Tuple]:
+    # the cache keeps an immutable copy; callers may mutate the result they were given
+    return result.output, tuple(result.data)
+
+
+def _from_cached(cached: Tuple[str, Tuple]) -> ToolResult:
+    output, data = cached
+    return ToolResult(output=output, data=list(data))
 
 
 class SearchMemoryTool(BaseTool):
     name = "search_memory"
     description = "Stub search over episodic notes"
 
-    def __init__(self, memory_dir: str, vector_store: Optional[VectorStore] = None):
+    def __init__(
+        self,
+        memory_dir: str,
+        vector_store: Optional[VectorStore] = None,
+        cache: Optional[QueryCache] = None,
+        notes: Optional[NoteStore] = None,
+        facts: Optional[FactIndex] = None,
+    ):
         self.memory_dir = memory_dir
-        os.makedirs(memory_dir, exist_ok=True)
+        self.notes = notes if notes is not None else TextNoteStore(memory_dir)
+        self.facts = facts if facts is not None else FactIndex(memory_dir)
         self.vector_store = vector_store
+        self.cache = cache
+
+    def lookup(self, key: str, session: str = "default", doc: str = "") -> Optional[Fact]:
+        """Exact-key fact recorded when a `NEEDLE: <key> -> <value>` note from `doc` was appended."""
+        return self.facts.get(key.strip(), session=session, doc=doc)
 
     def run(self, query: str, session: str = "default", top_k: int = 3) -> ToolResult:
-        # vector search if available
-        if self.vector_store and self.vector_store.items:
-            hits = self.vector_store.search(query, top_k=top_k)
-            texts = [self.vector_store.get_text(vid) for vid, _ in hits]
-            return ToolResult(output=" | ".join(texts) if texts else "no hits", data=texts)
+        return self._answer([query], session, top_k)[0]
 
-        path = os.path.join(self.memory_dir, f"{session}.notes.txt")
-        if not os.path.exists(path):
-            return ToolResult(output="no memory yet", data=[])
-        with open(path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        matches = [ln.strip() for ln in lines if query.lower() in ln.lower()]
-        top = matches[:top_k]
-        return ToolResult(output="; ".join(top) if top else "no hits", data=top)
+    def search_many(self, queries: List[str], session: str = "default", top_k: int = 3) -> ToolResult:
+        """Answer several queries with one vector-store pass (or index lookups in the notes log).
+
+        `data` holds one hit list per query; cached queries are not searched again.
+        """
+        results = self._answer(queries, session, top_k)
+        output = "\n".join(f"{q}: {res.output}" for q, res in zip(queries, results))
+        return ToolResult(output=output, data=[res.data for res in results])
+
+    def _answer(self, queries: List[str], session: str, top_k: int) -> List[ToolResult]:
+        # a query that is exactly a known fact key is answered from the fact index; that
+        # lookup is exact, so it runs ahead of the cache, whose keys ignore case and spacing
+        results: List[Optional[ToolResult]] = []
+        for query in queries:
+            fact = self.lookup(query, session)
+            line = f"NEEDLE: {query.strip()} -> {fact.value}" if fact is not None else None
+            results.append(ToolResult(output=line, data=[line]) if line else None)
+        use_vectors = self.vector_store is not None and self.vector_store.partition_size(session)
+        # vector scoring ignores case and spacing; the file fallback only ignores case
+        keys = [("vec", normalize_note(q).lower(), top_k) if use_vectors else ("file", q.lower(), top_k) for q in queries]
+        pending = []
+        for i, key in enumerate(keys):
+            if results[i] is not None:
+                continue
+            cached = self.cache.get(session, key) if self.cache is not None else None
+            if cached is not None:
+                results[i] = _from_cached(cached)
+            else:
+                pending.append(i)
+        if pending:
+            for i, res in zip(pending, self._search_notes([queries[i] for i in pending], session, top_k, use_vectors)):
+                results[i] = res
+                if self.cache is not None:
+                    self.cache.put(session, keys[i], _to_cached(res))
+        return results
+
+    def _search_notes(self, queries: List[str], session: str, top_k: int, use_vectors: bool) -> List[ToolResult]:
+        # vector search over this session's partition if it has any items
+        if use_vectors:
+            results = []
+            for hits in self.vector_store.search_many(queries, top_k=top_k, session=session):
+                texts = [self.vector_store.get_text(vid) for vid, _ in hits]
+                results.append(ToolResult(output=" | ".join(texts) if texts else "no hits", data=texts))
+            return results
+
+        if not self.notes.has_session(session):
+            return [ToolResult(output="no memory yet", data=[]) for _ in queries]
+        results = []
+        for query in queries:
+            top = self.notes.search(query, session=session, top_k=top_k)
+            results.append(ToolResult(output="; ".join(top) if top else "no hits", data=top))
+        return results
 
 
-def get_builtin_tools(memory_dir: str, vector_store: Optional[VectorStore] = None) -> Dict[str, BaseTool]:
+def get_builtin_tools(
+    memory_dir: str,
+    vector_store: Optional[VectorStore] = None,
+    cache_size: int = 256,
+    note_store: Optional[NoteStore] = None,
+    file_cache_bytes: int = 0,
+    python_workers: int = 0,
+    python_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, BaseTool]:
+    """`file_cache_bytes` > 0 gives read_file the process-wide content cache.
+    `python_workers` > 0 runs python_exec in a SandboxPool of that many workers;
+    `python_options` go to the pool (e.g. timeout, cpu_seconds, max_rss_bytes, max_calls, preload)."""
+    # one cache shared by the writer (which invalidates) and the reader
+    cache = QueryCache(max_entries=cache_size) if cache_size > 0 else None
+    notes = note_store if note_store is not None else TextNoteStore(memory_dir)
+    facts = FactIndex(memory_dir)
     tools: Dict[str, BaseTool] = {
-        PythonExecTool.name: PythonExecTool(),
-        ReadFileTool.name: ReadFileTool(),
+        PythonExecTool.name: PythonExecTool(pool=SandboxPool(python_workers, **(python_options or {})) if python_workers > 0 else None),
+        ReadFileTool.name: ReadFileTool(cache=shared_file_cache(file_cache_bytes) if file_cache_bytes > 0 else None),
         WriteFileTool.name: WriteFileTool(),
-        AppendNoteTool.name: AppendNoteTool(memory_dir, vector_store=vector_store),
-        SearchMemoryTool.name: SearchMemoryTool(memory_dir, vector_store=vector_store),
+        AppendNoteTool.name: AppendNoteTool(memory_dir, vector_store=vector_store, cache=cache, notes=notes, facts=facts),
+        SearchMemoryTool.name: SearchMemoryTool(memory_dir, vector_store=vector_store, cache=cache, notes=notes, facts=facts),
     }
     return tools
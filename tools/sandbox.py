@@ -0,0 +1,207 @@
+import importlib
+import io
+import math
+import multiprocessing as mp
+import os
+import queue
+import resource
+import signal
+import sys
+import traceback
+from contextlib import redirect_stdout
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+DEFAULT_PRELOAD = ("json", "re", "math", "collections", "itertools")
+DEFAULT_TIMEOUT_SECONDS = 10.0
+DEFAULT_MAX_RSS_BYTES = 512 << 20
+DEFAULT_MAX_CALLS = 200
+
+
+class CPULimitExceeded(Exception):
+    pass
+
+
+def execute(code: str) -> Tuple[str, Any]:
+    """Run a snippet in a fresh scope: (captured stdout plus `result=...`, the `result` variable)."""
+    buffer = io.StringIO()
+    local_scope: Dict[str, Any] = {}
+    with redirect_stdout(buffer):
+        exec(code, {}, local_scope)
+    result_obj = local_scope.get("result")
+    output_text = buffer.getvalue()
+    if result_obj is not None:
+        output_text += f"\nresult={result_obj!r}"
+    return output_text.strip(), result_obj
+
+
+def _on_xcpu(signum, frame):
+    raise CPULimitExceeded("cpu time limit exceeded")
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _address_space_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _worker_main(conn, preload: Sequence[str], cpu_seconds: float, max_rss_bytes: int) -> None:
+    for name in preload:
+        importlib.import_module(name)
+    signal.signal(signal.SIGXCPU, _on_xcpu)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    mapped = _address_space_bytes()
+    if mapped is not None:
+        # allocations past the budget fail with MemoryError instead of growing the worker
+        _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = mapped + max_rss_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit if as_hard == resource.RLIM_INFINITY else min(limit, as_hard), as_hard))
+    baseline = _peak_rss_bytes()
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            return
+        if code is None:
+            return
+        # RLIMIT_CPU counts the whole process, so each call's budget starts from what was used so far
+        soft = math.ceil(_cpu_seconds() + cpu_seconds)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if cpu_hard == resource.RLIM_INFINITY else min(soft, cpu_hard), cpu_hard))
+        hit_limit = False
+        try:
+            output, result = execute(code)
+        except BaseException as e:  # noqa: BLE001 - snippets may raise anything, SystemExit included
+            hit_limit = isinstance(e, (CPULimitExceeded, MemoryError))
+            output, result = f"error: {str(e) or type(e).__name__}\n{traceback.format_exc(limit=1)}", None
+        finally:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+        # a worker that hit a limit or grew past its budget is replaced after replying
+        retire = hit_limit or _peak_rss_bytes() - baseline > max_rss_bytes
+        try:
+            conn.send((output, result, retire))
+        except Exception:  # noqa: BLE001 - the result could not be pickled
+            conn.send((output, repr(result), retire))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.calls = 0
+
+    def kill(self) -> None:
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+class SandboxPool:
+    """Warm worker processes that run snippets in isolation, with time and memory limits.
+
+    Workers are forked up front (spawned off Linux) with `preload` already
+    imported, so a call pays neither process start-up nor import latency,
+    and a replacement worker is a fork away. Each call may use
+    `cpu_seconds` of CPU (default: the timeout; RLIMIT_CPU rounds it up to
+    whole seconds) before SIGXCPU ends it with an error, and `timeout`
+    seconds of wall clock before its worker is killed and replaced. A
+    worker may grow `max_rss_bytes` beyond its size at start: allocations
+    past that fail with MemoryError where the address-space limit is
+    honoured, and a worker whose peak RSS passed it is replaced. Workers
+    are also recycled after `max_calls` calls. Results come back pickled
+    over each worker's pipe; a `result` that cannot be pickled comes back
+    as its repr.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        cpu_seconds: float | None = None,
+        max_rss_bytes: int = DEFAULT_MAX_RSS_BYTES,
+        max_calls: int = DEFAULT_MAX_CALLS,
+    ):
+        if workers <= 0:
+            raise ValueError("SandboxPool needs at least one worker")
+        self.preload = tuple(preload)
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else timeout
+        self.max_rss_bytes = max_rss_bytes
+        self.max_calls = max_calls
+        # fork is only safe to rely on under Linux; elsewhere workers import everything themselves
+        self._ctx = mp.get_context("fork" if sys.platform.startswith("linux") else "spawn")
+        if self._ctx.get_start_method() == "fork":
+            for name in self.preload:
+                importlib.import_module(name)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = set()
+        self.stats = {"calls": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child, self.preload, self.cpu_seconds, self.max_rss_bytes),
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        worker = _Worker(process, parent)
+        self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        self._workers.discard(worker)
+        worker.kill()
+        return self._spawn()
+
+    def run(self, code: str) -> Tuple[str, Any]:
+        """(output, result) of a snippet run in an idle worker; waits for one if all are busy."""
+        worker = self._idle.get()
+        try:
+            self.stats["calls"] += 1
+            try:
+                worker.conn.send(code)
+                if not worker.conn.poll(self.timeout):
+                    self.stats["timeouts"] += 1
+                    worker = self._replace(worker)
+                    return f"error: timed out after {self.timeout:g}s", None
+                output, result, retire = worker.conn.recv()
+            except (EOFError, OSError):
+                # the worker died mid-call (killed by a hard limit, crashed interpreter)
+                self.stats["crashes"] += 1
+                worker = self._replace(worker)
+                return "error: sandbox worker exited", None
+            worker.calls += 1
+            if retire or worker.calls >= self.max_calls:
+                self.stats["recycled"] += 1
+                worker = self._replace(worker)
+            return output, result
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        for worker in list(self._workers):
+            worker.kill()
+        self._workers.clear()
+
+    def __enter__(self) -> "SandboxPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()